@@ -1,8 +1,16 @@
+import functools
+import hashlib
 import logging
 import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Real draws use the OS entropy source so assignments can't be predicted
+# from earlier ones; simulations keep the seedable module-level generator
+_SYSTEM_RANDOM = random.SystemRandom()
+
 
 class DrawError(Exception):
     """Base exception for draw-related errors"""
@@ -16,6 +24,31 @@ class InsufficientParticipantError(DrawError):
     pass
 
 
+class ParticipantTable:
+    """
+    Participant names encoded once as integer positions.
+
+    Draw loops work on successor lists of positions (giver i gives to
+    successors[i]); names are only needed to report the result
+    """
+
+    __slots__ = ("names", "index", "n")
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.n = len(self.names)
+
+    def encode(self, draw_result):
+        """
+        Convert a giver -> receiver dict into a successor list.
+
+        Receivers that are not in the table map to -1
+        """
+        index = self.index
+        return [index.get(draw_result[giver], -1) for giver in self.names]
+
+
 class DrawService:
     """
     Service for performing Secret Santa draws.
@@ -27,10 +60,68 @@ class DrawService:
     - Perfect 1-to-1 mapping
     """
 
+    __slots__ = ()
+
     MIN_PARTICIPANTS = 3
 
     @staticmethod
-    def perform_draw(participants):
+    def perform_draw(participants, *, skip_input_validation=False):
+        """
+        Perform a draw for the given participant names.
+
+        Callers drawing repeatedly from the same list can check it once
+        with _validate_input and pass skip_input_validation=True
+        """
+        if not skip_input_validation:
+            DrawService._validate_input(participants)
+
+        logger.info("Starting draw for %d participants", len(participants))
+
+        # Draw over integer positions and map back to names only once
+        successors = DrawService._draw_indices(len(participants), _SYSTEM_RANDOM)
+        draw_result = {
+            participants[giver]: participants[receiver]
+            for giver, receiver in enumerate(successors)
+        }
+
+        # Validate the result; the detailed name-based check only runs to
+        # build the error message once the fast check has failed
+        if not DrawService._validate_draw_fast(successors):
+            DrawService._validate_draw(draw_result, participants)
+            raise DrawError("Draw result is not a valid assignment")
+
+        logger.info("Draw completed successfully: %d pairs created", len(draw_result))
+        return draw_result
+
+    @staticmethod
+    def draw_successors(n):
+        """
+        Draw a validated cyclic assignment over n participant positions.
+
+        Returns a successor list: giver i gives to successors[i]
+        """
+        successors = DrawService._draw_indices(n)
+
+        if not DrawService._validate_draw_fast(successors):
+            raise DrawError("Draw result is not a valid assignment")
+
+        return successors
+
+    @staticmethod
+    def _validate_input(participants):
+        """
+        Check that the participant list can be drawn
+        """
+        DrawService._validate_input_cached(tuple(participants))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def _validate_input_cached(participants):
+        """
+        Input checks memoized per participant tuple.
+
+        Only passing lists are cached; invalid input raises every time
+        """
         if not participants:
             raise InsufficientParticipantError("No participants provided")
 
@@ -43,35 +134,40 @@ class DrawService:
         if len(participants) != len(set(participants)):
             raise DrawError("Duplicate participant names detected")
 
-        logger.info(f"Starting draw for {len(participants)} participants")
-
-        # Create a shuffled copy to ensure randomness
-        shuffled = participants.copy()
-        random.shuffle(shuffled)
+    @staticmethod
+    def _draw_indices(n, rng=random):
+        """
+        Create a random cyclic assignment over participant positions.
 
-        # Create cyclic assignment
-        draw_result = DrawService._create_cyclic_assignment(shuffled)
+        Sattolo's shuffle yields a uniformly random single n-cycle in one
+        pass, so nobody draws themselves and no retries are needed.
+        Returns a successor list: giver i gives to successors[i]
+        """
+        successors = list(range(n))
+        randrange = rng.randrange
 
-        # Validate the result
-        DrawService._validate_draw(draw_result, participants)
+        for i in range(n - 1, 0, -1):
+            j = randrange(i)
+            successors[i], successors[j] = successors[j], successors[i]
 
-        logger.info(f"Draw completed successfully: {len(draw_result)} pairs created")
-        return draw_result
+        return successors
 
     @staticmethod
-    def _create_cyclic_assignment(participants):
+    def _validate_draw_fast(successors):
         """
-        Create a cyclic assignment where each person gives to the next
+        Check a successor list in a single pass.
+
+        Valid when nobody gives to themselves and every position
+        receives exactly once
         """
-        result = {}
-        n = len(participants)
+        seen = bytearray(len(successors))
 
-        for i in range(n):
-            giver = participants[i]
-            receiver = participants[(i + 1) % n]
-            result[giver] = receiver
+        for giver, receiver in enumerate(successors):
+            if receiver == giver or seen[receiver]:
+                return False
+            seen[receiver] = 1
 
-        return result
+        return True
 
     @staticmethod
     def _validate_draw(draw_result, original_participants):
@@ -114,58 +210,62 @@ class DrawService:
         """
         Verify mathematical properties of the draw
         """
-        checks = {
-            "no_self_assignment": True,
-            "is_permutation": True,
-            "is_cyclic": True,
-        }
-
-        # Check no self-assignments
-        for giver, receiver in draw_result.items():
-            if giver == receiver:
-                checks["no_self_assignment"] = False
-                break
+        # Translate to a successor list of positions over the givers
+        successors = ParticipantTable(draw_result).encode(draw_result)
 
-        # Check if it's a valid permutation
-        givers = set(draw_result.keys())
-        receivers = set(draw_result.values())
-        checks["is_permutation"] = givers == receivers
-
-        # Check if it forms a cycle
-        if draw_result:
-            try:
-                visited = set()
-                current = next(iter(draw_result.keys()))
-                start = current
-
-                while current not in visited:
-                    visited.add(current)
-                    current = draw_result.get(current)
-
-                    if current is None:
-                        checks["is_cyclic"] = False
-                        break
+        return dict(
+            zip(
+                ("no_self_assignment", "is_permutation", "is_cyclic"),
+                DrawService._verify_successors(successors),
+            )
+        )
 
-                # Should return to start and visit all participants
-                checks["is_cyclic"] = current == start and len(visited) == len(
-                    draw_result
-                )
-            except Exception:
-                checks["is_cyclic"] = False
+    @staticmethod
+    def _verify_successors(successors):
+        """
+        Check (no_self_assignment, is_permutation, is_cyclic) for a
+        successor list in a single walk
+        """
+        n = len(successors)
+        seen = bytearray(n)
+        no_self = True
+        is_permutation = True
+
+        for giver, receiver in enumerate(successors):
+            if receiver == giver:
+                no_self = False
+            if receiver < 0 or seen[receiver]:
+                is_permutation = False
+            else:
+                seen[receiver] = 1
+
+        # A single cycle returns to the start after exactly n steps
+        is_cyclic = True
+        if n:
+            current, steps = successors[0], 1
+            while current > 0 and steps < n:
+                current = successors[current]
+                steps += 1
+            is_cyclic = current == 0 and steps == n
+
+        return no_self, is_permutation, is_cyclic
 
-        return checks
 
 class DrawStatistics:
     """
     Utility class for analyzing draw results and running simulations
     """
 
+    __slots__ = ()
+
     @staticmethod
-    def run_simulation(participants, iterations):
+    def run_simulation(participants, iterations, workers=1):
         """
         Run multiple draw simulations to verify algorithm correctness
+
+        With workers > 1 the iterations are split into chunks that run in
+        separate processes, each with its own random seed
         """
-        service = DrawService()
         stats = {
             "total_iterations": iterations,
             "successful_draws": 0,
@@ -175,68 +275,131 @@ class DrawStatistics:
             "errors": [],
         }
 
-        unique_results = set()
+        # The participant list is the same for every iteration, so check it once
+        try:
+            DrawService._validate_input(participants)
+        except DrawError as e:
+            stats["failed_draws"] = iterations
+            stats["errors"].append(str(e))
+            logger.error("Simulation input rejected: %s", e)
+            return stats
+
+        table = ParticipantTable(participants)
+
+        if workers <= 1 or iterations < workers:
+            chunks = [DrawStatistics._run_simulation_chunk(table.n, 0, iterations)]
+        else:
+            chunk_size, remainder = divmod(iterations, workers)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = []
+                start = 0
+                for w in range(workers):
+                    size = chunk_size + (1 if w < remainder else 0)
+                    futures.append(
+                        executor.submit(
+                            DrawStatistics._run_simulation_chunk,
+                            table.n,
+                            start,
+                            size,
+                            random.getrandbits(64),
+                        )
+                    )
+                    start += size
+                chunks = [future.result() for future in futures]
 
-        for i in range(iterations):
-            try:
-                result = service.perform_draw(participants)
-                stats["successful_draws"] += 1
-
-                has_self_assignment = any(
-
-                giver == receiver 
-                for giver, receiver in result.items()
-                )
-
-                if has_self_assignment:
-                    stats["self_assignments_detected"] += 1
-
-                # Track unique results (as frozen set of tuples)
-                result_tuple = tuple(sorted(result.items()))
-                unique_results.add(result_tuple)
-
-            except Exception as e:
-                stats["failed_draws"] += 1
-                stats["errors"].append(str(e))
-                logger.error(f"Draw failed in iteration {i+1}: {e}")
+        unique_results = set()
+        for chunk in chunks:
+            stats["successful_draws"] += chunk["successful_draws"]
+            stats["failed_draws"] += chunk["failed_draws"]
+            stats["self_assignments_detected"] += chunk["self_assignments_detected"]
+            stats["errors"].extend(chunk["errors"])
+            unique_results |= chunk["fingerprints"]
 
         stats["unique_results"] = len(unique_results)
 
         logger.info(
-            f"Simulation complete: {stats['successful_draws']}/{iterations} successful, "
-            f"{stats['unique_results']} unique results"
+            "Simulation complete: %d/%d successful, %d unique results",
+            stats["successful_draws"],
+            iterations,
+            stats["unique_results"],
         )
 
         return stats
-    
 
     @staticmethod
-    def analyze_draw_distribution(participants, iterations):
+    def _run_simulation_chunk(n, start, iterations, seed=None):
         """
-        Analyze the distribution of assignments over multiple draws.
+        Run a contiguous block of simulation iterations over n positions.
+
+        Returns partial counters plus the set of result fingerprints
         """
-        service = DrawService()
+        if seed is not None:
+            random.seed(seed)
 
-        distribution = {p: {other: 0 for other in participants if other != p} 
-               for p in participants}
-        
-        for _ in range(iterations):
-            try:
-                result = service.perform_draw(participants)
-                for giver, receiver in result.items():
-                    distribution[giver][receiver] += 1
-            except Exception as e:
-                logger.error(f"Draw failed during distribution analysis: {e}")
+        draw_successors = DrawService.draw_successors
+        chunk = {
+            "successful_draws": 0,
+            "failed_draws": 0,
+            "self_assignments_detected": 0,
+            "fingerprints": set(),
+            "errors": [],
+        }
 
-        return distribution
+        for i in range(start, start + iterations):
+            try:
+                successors = draw_successors(n)
+                chunk["successful_draws"] += 1
 
+                has_self_assignment = any(
+                    giver == receiver
+                    for giver, receiver in enumerate(successors)
+                )
 
+                if has_self_assignment:
+                    chunk["self_assignments_detected"] += 1
 
+                # Track unique results by a short hash of the successor list
+                fingerprint = hashlib.blake2b(
+                    array("I", successors).tobytes(), digest_size=8
+                ).digest()
+                chunk["fingerprints"].add(fingerprint)
 
+            except Exception as e:
+                chunk["failed_draws"] += 1
+                chunk["errors"].append(str(e))
+                logger.error("Draw failed in iteration %d: %s", i + 1, e)
 
+        return chunk
 
+    @staticmethod
+    def analyze_draw_distribution(participants, iterations):
+        """
+        Analyze the distribution of assignments over multiple draws.
+        """
+        draw_successors = DrawService.draw_successors
 
+        # Accumulate into a flat n*n counter indexed by position and only
+        # build the nested dict once, at the end
+        table = ParticipantTable(participants)
+        n = table.n
+        counts = [0] * (n * n)
 
-        
+        try:
+            DrawService._validate_input(participants)
+        except DrawError as e:
+            logger.error("Distribution analysis input rejected: %s", e)
+            iterations = 0
 
+        for _ in range(iterations):
+            try:
+                successors = draw_successors(n)
+                for giver, receiver in enumerate(successors):
+                    counts[giver * n + receiver] += 1
+            except Exception as e:
+                logger.error("Draw failed during distribution analysis: %s", e)
 
+        names = table.names
+        return {
+            p: {other: counts[i * n + j] for j, other in enumerate(names) if j != i}
+            for i, p in enumerate(names)
+        }
@@ -1,72 +1,97 @@
 import csv
 import logging
-from io import BytesIO, StringIO
+from io import BytesIO, StringIO, TextIOWrapper
+from operator import attrgetter
 from typing import List
 
 from src.database.models import DrawResult
 
 logger = logging.getLogger(__name__)
 
+# Private message template sent to each giver
+INDIVIDUAL_MESSAGE_TEMPLATE = (
+    "🎅 <b>Secret Santa</b>\n\n"
+    "Привіт, {giver}!\n\n"
+    "🎁 Ти даруєш подарунок для:\n"
+    "<b>{receiver}</b>\n\n"
+    "Нікому не кажи про це! 🤫\n"
+    "Це таємниця до обміну подарунками!"
+)
+
 
 class ExportService:
     """Service for exporting draw results in various formats"""
+
+    __slots__ = ()
+    
+    @staticmethod
+    def _sorted(results):
+        """
+        Sort results by giver name for consistent output
+        """
+        return sorted(results, key=attrgetter("giver_name"))
     
     @staticmethod
-    def generate_text_export(results, game_code):
+    def generate_text_export(results, game_code, presorted=False):
         """
         Generate text export of draw results.
+        
+        Pass presorted=True when results are already ordered by giver name.
         """
         if not results:
             return f"Немає результатів для гри {game_code}"
         
-        lines = [
-            f"🎁 Результати Secret Santa {game_code}",
-            "",
-            f"Всього пар: {len(results)}",
-            "",
-            "=" * 50,
-            ""
-        ]
+        buf = StringIO()
+        buf.write(
+            f"🎁 Результати Secret Santa {game_code}\n"
+            "\n"
+            f"Всього пар: {len(results)}\n"
+            "\n"
+            f"{'=' * 50}\n"
+            "\n"
+        )
         
-        # Sort by giver name for consistent output
-        sorted_results = sorted(results, key=lambda r: r.giver_name)
+        sorted_results = results if presorted else ExportService._sorted(results)
         
         for result in sorted_results:
-            lines.append(f"{result.giver_name} → дарує → {result.receiver_name}")
+            buf.write(f"{result.giver_name} → дарує → {result.receiver_name}\n")
         
-        lines.extend([
-            "",
-            "=" * 50,
-            "",
-            "⚠️ КОНФІДЕНЦІЙНО: Не діліться цим списком з учасниками!",
+        buf.write(
+            "\n"
+            f"{'=' * 50}\n"
+            "\n"
+            "⚠️ КОНФІДЕНЦІЙНО: Не діліться цим списком з учасниками!\n"
             "Кожен учасник має знати тільки своє призначення."
-        ])
+        )
         
-        return "\n".join(lines)
+        return buf.getvalue()
     
     @staticmethod
-    def generate_csv_export(results):
+    def generate_csv_export(results, presorted=False):
         """
         Generate CSV file with draw results.
         """
-        output = StringIO()
+        # Encode straight into the byte buffer (BOM for Excel)
+        csv_bytes = BytesIO()
+        output = TextIOWrapper(csv_bytes, encoding='utf-8-sig', newline='')
         writer = csv.writer(output)
         
         # Write header
         writer.writerow(["Дарує", "Отримує"])
         
-        # Sort by giver name
-        sorted_results = sorted(results, key=lambda r: r.giver_name)
+        sorted_results = results if presorted else ExportService._sorted(results)
         
         # Write data rows
-        for result in sorted_results:
-            writer.writerow([result.giver_name, result.receiver_name])
+        writer.writerows(
+            (result.giver_name, result.receiver_name) for result in sorted_results
+        )
         
-        # Convert to BytesIO for file sending
-        csv_bytes = BytesIO(output.getvalue().encode('utf-8-sig'))  # BOM for Excel
+        # Release the buffer from the wrapper so it stays open for sending
+        output.flush()
+        output.detach()
         csv_bytes.seek(0)
         
-        logger.info(f"Generated CSV export with {len(results)} rows")
+        logger.info("Generated CSV export with %d rows", len(results))
         
         return csv_bytes
     
@@ -78,63 +103,58 @@ class ExportService:
         This can be used to send private messages to each participant
         telling them who they should give a gift to
         """
-        messages = {}
+        render = INDIVIDUAL_MESSAGE_TEMPLATE.format
         
-        for result in results:
-            message = (
-                f"🎅 <b>Secret Santa</b>\n\n"
-                f"Привіт, {result.giver_name}!\n\n"
-                f"🎁 Ти даруєш подарунок для:\n"
-                f"<b>{result.receiver_name}</b>\n\n"
-                f"Нікому не кажи про це! 🤫\n"
-                f"Це таємниця до обміну подарунками!"
+        return {
+            result.giver_name: render(
+                giver=result.giver_name, receiver=result.receiver_name
             )
-            messages[result.giver_name] = message
-        
-        return messages
+            for result in results
+        }
     
     @staticmethod
-    def generate_markdown_export(results, game_code):
+    def generate_markdown_export(results, game_code, presorted=False):
         """
         Generate Markdown-formatted export
         """
         if not results:
             return f"# Немає результатів для гри {game_code}"
         
-        lines = [
-            f"# 🎁 Secret Santa {game_code}",
-            "",
-            f"**Всього пар:** {len(results)}",
-            "",
-            "## Результати жеребкування",
-            "",
-            "| Дарує | Отримує |",
-            "|-------|---------|"
-        ]
+        buf = StringIO()
+        buf.write(
+            f"# 🎁 Secret Santa {game_code}\n"
+            "\n"
+            f"**Всього пар:** {len(results)}\n"
+            "\n"
+            "## Результати жеребкування\n"
+            "\n"
+            "| Дарує | Отримує |\n"
+            "|-------|---------|\n"
+        )
         
-        # Sort by giver name
-        sorted_results = sorted(results, key=lambda r: r.giver_name)
+        sorted_results = results if presorted else ExportService._sorted(results)
         
         for result in sorted_results:
-            lines.append(f"| {result.giver_name} | {result.receiver_name} |")
-        
-        lines.extend([
-            "",
-            "---",
-            "",
-            "⚠️ **КОНФІДЕНЦІЙНО**",
-            "",
-            "Не діліться цим списком з учасниками!",
+            buf.write(f"| {result.giver_name} | {result.receiver_name} |\n")
+        
+        buf.write(
+            "\n"
+            "---\n"
+            "\n"
+            "⚠️ **КОНФІДЕНЦІЙНО**\n"
+            "\n"
+            "Не діліться цим списком з учасниками!\n"
             "Кожен має знати тільки своє призначення."
-        ])
+        )
         
-        return "\n".join(lines)
+        return buf.getvalue()
     
     @staticmethod
-    def generate_json_export(results):
+    def generate_json_export(results, presorted=False):
         """
         Generate JSON-serializable export.
         """
+        sorted_results = results if presorted else ExportService._sorted(results)
         return {
             "total_pairs": len(results),
             "results": [
@@ -142,7 +162,7 @@ class ExportService:
                     "giver": result.giver_name,
                     "receiver": result.receiver_name
                 }
-                for result in sorted(results, key=lambda r: r.giver_name)
+                for result in sorted_results
             ]
         }
     
@@ -154,26 +174,30 @@ class ExportService:
         if not results:
             return False, "No results to validate"
         
-        givers = set()
-        receivers = set()
+        # One dict of role flags per name: 1 = giver, 2 = receiver
+        roles = {}
         
         for result in results:
+            giver, receiver = result.giver_name, result.receiver_name
+            
             # Check self-assignment
-            if result.giver_name == result.receiver_name:
-                return False, f"Self-assignment detected: {result.giver_name}"
+            if giver == receiver:
+                return False, f"Self-assignment detected: {giver}"
             
             # Check duplicates
-            if result.giver_name in givers:
-                return False, f"Duplicate giver: {result.giver_name}"
+            giver_flags = roles.get(giver, 0)
+            if giver_flags & 1:
+                return False, f"Duplicate giver: {giver}"
+            roles[giver] = giver_flags | 1
             
-            if result.receiver_name in receivers:
-                return False, f"Duplicate receiver: {result.receiver_name}"
-            
-            givers.add(result.giver_name)
-            receivers.add(result.receiver_name)
-        
-        # Check that giver and receiver sets match
-        if givers != receivers:
+            receiver_flags = roles.get(receiver, 0)
+            if receiver_flags & 2:
+                return False, f"Duplicate receiver: {receiver}"
+            roles[receiver] = receiver_flags | 2
+        
+        # With no duplicates there are n distinct givers and n distinct
+        # receivers, so the sets match exactly when only n names were seen
+        if len(roles) != len(results):
             return False, "Giver and receiver sets don't match"
         
         return True, "Valid"
@@ -181,42 +205,43 @@ class ExportService:
 
 class ExportFormatter:
     """Helper class for formatting export data"""
+
+    __slots__ = ()
     
     @staticmethod
-    def format_table(results):
+    def format_table(results, presorted=False):
         """
         Format results as an ASCII table.
         """
         if not results:
             return "Немає результатів"
         
-        # Calculate column widths
-        sorted_results = sorted(results, key=lambda r: r.giver_name)
-        
-        max_giver = max(len(r.giver_name) for r in sorted_results)
-        max_receiver = max(len(r.receiver_name) for r in sorted_results)
+        sorted_results = results if presorted else ExportService._sorted(results)
         
-        # Ensure minimum width
-        giver_width = max(max_giver, 10)
-        receiver_width = max(max_receiver, 10)
+        # Collect rows and column widths (minimum 10) in a single pass
+        giver_width = receiver_width = 10
+        rows = []
+        for result in sorted_results:
+            giver, receiver = result.giver_name, result.receiver_name
+            if len(giver) > giver_width:
+                giver_width = len(giver)
+            if len(receiver) > receiver_width:
+                receiver_width = len(receiver)
+            rows.append((giver, receiver))
         
         # Create table
-        lines = []
+        buf = StringIO()
         
         # Header
-        header = f"┌─{'─' * giver_width}─┬─{'─' * receiver_width}─┐"
-        title = f"│ {'Дарує'.ljust(giver_width)} │ {'Отримує'.ljust(receiver_width)} │"
-        separator = f"├─{'─' * giver_width}─┼─{'─' * receiver_width}─┤"
-        
-        lines.extend([header, title, separator])
+        buf.write(f"┌─{'─' * giver_width}─┬─{'─' * receiver_width}─┐\n")
+        buf.write(f"│ {'Дарує'.ljust(giver_width)} │ {'Отримує'.ljust(receiver_width)} │\n")
+        buf.write(f"├─{'─' * giver_width}─┼─{'─' * receiver_width}─┤\n")
         
         # Data rows
-        for result in sorted_results:
-            row = f"│ {result.giver_name.ljust(giver_width)} │ {result.receiver_name.ljust(receiver_width)} │"
-            lines.append(row)
+        for giver, receiver in rows:
+            buf.write(f"│ {giver.ljust(giver_width)} │ {receiver.ljust(receiver_width)} │\n")
         
         # Footer
-        footer = f"└─{'─' * giver_width}─┴─{'─' * receiver_width}─┘"
-        lines.append(footer)
+        buf.write(f"└─{'─' * giver_width}─┴─{'─' * receiver_width}─┘")
         
-        return "\n".join(lines)
\ No newline at end of file
+        return buf.getvalue()
\ No newline at end of file
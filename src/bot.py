@@ -20,6 +20,7 @@ from .handlers import (
     button_router,
 )
 from .handlers.game_purge import auto_purge_expired_games
+from .middlewares import ChatSerializer, SendRateLimiter
 
 # Configure logging
 logging.basicConfig(
@@ -48,16 +49,19 @@ async def auto_purge_task():
             seconds_until_midnight = (midnight - now).total_seconds()
             
             # Wait until midnight
-            logger.info(f"Auto-purge scheduled in {seconds_until_midnight/3600:.1f} hours")
+            logger.info(
+                "Auto-purge scheduled in %.1f hours",
+                seconds_until_midnight / 3600,
+            )
             await asyncio.sleep(seconds_until_midnight)
             
             # Run auto-purge
             logger.info("Running scheduled auto-purge...")
             purged_count = await auto_purge_expired_games()
-            logger.info(f"Auto-purge completed: {purged_count} games removed")
+            logger.info("Auto-purge completed: %s games removed", purged_count)
             
         except Exception as e:
-            logger.error(f"Error in auto-purge task: {e}", exc_info=True)
+            logger.error("Error in auto-purge task: %s", e, exc_info=True)
             # Wait 1 hour before retrying
             await asyncio.sleep(3600)
 
@@ -69,21 +73,30 @@ async def on_startup(bot):
     logger.info("Starting Secret Santa Bot...")
     
     # Initialize database
-    init_db(settings.database_url, echo=settings.debug)
+    init_db(
+        settings.database_url,
+        echo=settings.debug,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        read_database_url=settings.read_database_url,
+    )
     
     # Create tables if they don't exist
     await create_tables()
     
     # Get bot info
     bot_info = await bot.get_me()
-    logger.info(f"Bot started: @{bot_info.username}")
-    logger.info(f"Bot ID: {bot_info.id}")
+    logger.info("Bot started: @%s", bot_info.username)
+    logger.info("Bot ID: %s", bot_info.id)
     
     # Check initial auto-purge
     logger.info("Checking for expired games on startup...")
     purged_count = await auto_purge_expired_games()
     if purged_count > 0:
-        logger.info(f"Startup auto-purge: {purged_count} games removed")
+        logger.info("Startup auto-purge: %s games removed", purged_count)
 
 
 async def on_shutdown(bot):
@@ -108,10 +121,16 @@ async def main():
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
+    # Smooth reply bursts to Telegram's ~30 messages/s bot-wide limit
+    bot.session.middleware(SendRateLimiter(rate=30))
+    
     # Create dispatcher with FSM storage
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
     
+    # Updates run concurrently across chats, in order within a chat
+    dp.update.outer_middleware(ChatSerializer())
+    
     # Register routers
     # Button router should be first to handle button presses before commands
     dp.include_router(button_router)
@@ -138,10 +157,11 @@ async def main():
         logger.info("Starting polling...")
         await dp.start_polling(
             bot,
-            allowed_updates=dp.resolve_used_update_types()
+            allowed_updates=dp.resolve_used_update_types(),
+            handle_as_tasks=True,  # The default, relied on by ChatSerializer
         )
     except Exception as e:
-        logger.error(f"Critical error: {e}", exc_info=True)
+        logger.error("Critical error: %s", e, exc_info=True)
     finally:
         await bot.session.close()
 
@@ -155,7 +175,7 @@ def run():
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Fatal error: {e}", exc_info=True)
+        logger.error("Fatal error: %s", e, exc_info=True)
         sys.exit(1)
 
 
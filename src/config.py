@@ -34,6 +34,37 @@ class Settings(BaseSettings):
         description="Database connection URL"
     )
     
+    read_database_url: Optional[str] = Field(
+        default=None,
+        description="Read-only replica URL for /list and /info (defaults to DATABASE_URL)"
+    )
+    
+    # Connection pool settings (ignored for SQLite)
+    db_pool_size: int = Field(
+        default=25,
+        description="Connections kept open in the database pool"
+    )
+    
+    db_max_overflow: int = Field(
+        default=25,
+        description="Extra connections allowed above db_pool_size under load"
+    )
+    
+    db_pool_timeout: int = Field(
+        default=10,
+        description="Seconds to wait for a free pooled connection"
+    )
+    
+    db_pool_recycle: int = Field(
+        default=1800,
+        description="Seconds after which pooled connections are replaced"
+    )
+    
+    db_pool_pre_ping: bool = Field(
+        default=False,
+        description="Test each pooled connection with a ping before use"
+    )
+    
     # Auto-purge settings
     enable_auto_purge: bool = Field(
         default=True,
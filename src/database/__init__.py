@@ -1,7 +1,7 @@
 """Database package for Secret Santa Bot"""
 
-from .models import Base, Game, Participant, DrawResult
-from .database import init_db, get_session, create_tables, close_db
+from .models import Base, Game, Participant, DrawResult, utc_now
+from .database import init_db, get_session, get_read_session, create_tables, close_db
 from .repository import GameRepository
 
 __all__ = [
@@ -9,8 +9,10 @@ __all__ = [
     "Game",
     "Participant",
     "DrawResult",
+    "utc_now",
     "init_db",
     "get_session",
+    "get_read_session",
     "create_tables",
     "close_db",
     "GameRepository",
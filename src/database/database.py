@@ -1,9 +1,11 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
+    async_scoped_session,
     async_sessionmaker,
     create_async_engine,
 )
@@ -14,47 +16,136 @@ logger = logging.getLogger(__name__)
 
 # Global engine and session factory
 _engine = None
-_session_factory = None 
-
-def init_db(database_url: str, echo: bool = False):
+_session_factory = None
+# One session per asyncio task (aiogram handles each update in its own task)
+_scoped_session = None
+# Optional read-only replica for handlers that never write
+_read_engine = None
+_read_session_factory = None
+
+
+def _create_engine(
+    database_url, echo, pool_size, max_overflow, pool_timeout, pool_recycle,
+    pool_pre_ping,
+):
     """
-    Initialize database engine and session factory.
+    Create an async engine configured for database_url's backend
     """
-    global _engine, _session_factory
-
-    logger.info(f"Initializing database connection: {database_url.split('://')[0]}://...")
+    # Always talk to PostgreSQL through the native async driver
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if database_url.startswith(prefix):
+            database_url = "postgresql+asyncpg://" + database_url[len(prefix):]
+            break
+
+    logger.info(
+        "Initializing database connection: %s://...",
+        database_url.split("://")[0],
+    )
 
     # SQLite-specific configuration
     connect_args = {}
+    engine_options = {}
     if "sqlite" in database_url:
         # Enable foreign keys for SQLite (required for CASCADE to work)
         connect_args = {"check_same_thread": False}
-
-    _engine = create_async_engine(
+    else:
+        # Server databases: size the pool for concurrent update handling
+        # so handlers don't queue for a connection
+        engine_options = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+        }
+
+    if database_url.startswith("postgresql+asyncpg://"):
+        connect_args = {
+            # Reuse server-side prepared statements for repeated lookups
+            "prepared_statement_cache_size": 500,
+            # Short OLTP queries only lose time to JIT compilation
+            "server_settings": {"jit": "off"},
+            "command_timeout": 60,
+        }
+
+    engine = create_async_engine(
         database_url,
         echo=echo,
-        pool_pre_ping=True,
-        pool_recycle=3600, # Recycle connections after 1 hour
+        # Off by default: pool_recycle already retires idle connections
+        # before servers drop them, and a ping costs a round-trip per checkout
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle,
+        query_cache_size=1200,  # Compiled statement cache (default 500)
         connect_args=connect_args,
+        **engine_options,
     )
 
     # Enable foreign keys for SQLite
     if "sqlite" in database_url:
-        @event.listens_for(_engine.sync_engine, "connect")
+        @event.listens_for(engine.sync_engine, "connect")
         def set_sqlite_pragma(dbapi_conn, connection_record):
             cursor = dbapi_conn.cursor()
             cursor.execute("PRAGMA foreign_keys=ON")
+            # WAL lets readers run alongside a writer; NORMAL sync only
+            # fsyncs at checkpoints, which is durable enough for this bot
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+            cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
             cursor.close()
-        logger.info("SQLite foreign keys enabled")
+        logger.info("SQLite foreign keys and WAL mode enabled")
+
+    return engine
+
+
+def init_db(
+    database_url: str,
+    echo: bool = False,
+    pool_size: int = 25,
+    max_overflow: int = 25,
+    pool_timeout: int = 10,
+    pool_recycle: int = 1800,
+    pool_pre_ping: bool = False,
+    read_database_url: str | None = None,
+):
+    """
+    Initialize database engine and session factory.
+
+    read_database_url, if given, points get_read_session() at a read-only
+    replica with its own pool
+    """
+    global _engine, _session_factory, _scoped_session
+    global _read_engine, _read_session_factory
+
+    pool_options = dict(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+    )
+    _engine = _create_engine(database_url, echo, **pool_options)
 
     _session_factory = async_sessionmaker(
         _engine,
         class_=AsyncSession,
         expire_on_commit=False,
         autocommit=False,
-        autoflush=True,  # Changed to True to ensure data is flushed before commit
+        autoflush=False,  # Repository methods flush explicitly; commit flushes anyway
+    )
+    _scoped_session = async_scoped_session(
+        _session_factory, scopefunc=asyncio.current_task
     )
 
+    if read_database_url:
+        _read_engine = _create_engine(read_database_url, echo, **pool_options)
+        _read_session_factory = async_sessionmaker(
+            _read_engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
+        logger.info("Read-only replica configured for read sessions")
+
     logger.info("Database connection initialized successfully")
 
 
@@ -81,31 +172,77 @@ async def drop_tables():
 
 @asynccontextmanager
 async def get_session():
-    if _session_factory is None:
+    """
+    Yield the current task's session.
+
+    Nested get_session() blocks in the same task share one session; the
+    outermost block commits (or rolls back) and releases it
+    """
+    if _scoped_session is None:
         raise RuntimeError("Database not initialized. Call init_db() first.")
-    session = _session_factory()
+    session = _scoped_session()
+    depth = session.info.get("depth", 0)
+    session.info["depth"] = depth + 1
+    if depth:
+        try:
+            yield session
+        finally:
+            session.info["depth"] = depth
+        return
+
     try:
         logger.debug("Session started")
         yield session
         await session.commit()
         logger.debug("Session committed successfully")
     except Exception as e:
-        logger.error(f"Session error, rolling back: {e}")
+        logger.error("Session error, rolling back: %s", e)
         await session.rollback()
         raise
     finally:
-        await session.close()
+        # remove() closes the session and drops it from the task registry
+        await _scoped_session.remove()
         logger.debug("Session closed")
 
+
+@asynccontextmanager
+async def get_read_session():
+    """
+    Yield a session for read-only handlers.
+
+    Uses the replica when one is configured, else the primary session
+    """
+    if _read_session_factory is None:
+        async with get_session() as session:
+            yield session
+        return
+
+    session = _read_session_factory()
+    # Replica rows may lag behind; the repository won't cache them
+    session.info["read_only"] = True
+    try:
+        yield session
+    finally:
+        # Nothing to commit; close() rolls the read transaction back
+        await session.close()
+
+
 async def close_db():
     """
     Close database connection.
     """
-    global _engine, _session_factory
+    global _engine, _session_factory, _scoped_session
+    global _read_engine, _read_session_factory
+
+    if _read_engine is not None:
+        await _read_engine.dispose()
+        _read_engine = None
+        _read_session_factory = None
 
     if _engine is not None:
         logger.info("Closing database connection...")
         await _engine.dispose()
         _engine = None
         _session_factory = None
+        _scoped_session = None
         logger.info("Database connection closed")
\ No newline at end of file
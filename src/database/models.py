@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List
 
 from sqlalchemy import (
@@ -6,16 +6,25 @@ from sqlalchemy import (
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
+    func,
 )
-from sqlalchemy.orm import DeclarativeBase, mapped_column, relationship, Mapped
+from sqlalchemy.orm import DeclarativeBase, mapped_column, relationship, Mapped, validates
 
 
 class Base(DeclarativeBase): ...
 
 
+def utc_now():
+    """
+    Current UTC time as a naive datetime, matching the DateTime columns
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Game(Base):
     """
     Represents a Secret Santa game
@@ -42,18 +51,37 @@ class Game(Base):
     is_locked: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     is_drawn: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.utcnow, nullable=False
+        DateTime, default=utc_now, nullable=False
     )
     auto_purge_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     # Relationships
+    # Collections must be loaded explicitly (selectinload); an implicit
+    # lazy load would fail under AsyncSession anyway, so make it loud
     participants: Mapped[List["Participant"]] = relationship(
-        "Participant", back_populates="game", cascade="all, delete-orphan"
+        "Participant",
+        back_populates="game",
+        cascade="all, delete-orphan",
+        order_by="(Participant.joined_at, Participant.id)",
+        lazy="raise",
     )
     draw_results: Mapped[List["DrawResult"]] = relationship(
-        "DrawResult", back_populates="game", cascade="all, delete-orphan"
+        "DrawResult",
+        back_populates="game",
+        cascade="all, delete-orphan",
+        order_by="DrawResult.giver_name",
+        lazy="raise",
     )
 
+    # Fetch id as part of the INSERT instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
+    @validates("game_code")
+    def _normalize_game_code(self, key, game_code):
+        # Codes are stored upper-case so the plain unique index on
+        # game_code serves case-insensitive lookups
+        return game_code.upper()
+
     def __repr__(self):
         return (
             f"<Game(id={self.id}, code='{self.game_code}', "
@@ -81,7 +109,7 @@ class Participant(Base):
     )
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     joined_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.utcnow, nullable=False
+        DateTime, default=utc_now, nullable=False
     )
 
     # Relationships
@@ -89,8 +117,21 @@ class Participant(Base):
 
     __table_args__ = (
         UniqueConstraint("game_id", "name", name="uq_game_participant_name"),
+        # Serves "participants of a game in join order" without a sort
+        Index("ix_participants_game_joined", "game_id", "joined_at"),
+        # Case variants of a name count as the same participant; this also
+        # serves the participant_exists lookup
+        Index(
+            "uq_game_participant_name_lower",
+            "game_id",
+            func.lower(name),
+            unique=True,
+        ),
     )
 
+    # Fetch id as part of the INSERT instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return (
             f"<Participant(id={self.id}, name='{self.name}', game_id={self.game_id})>"
@@ -119,7 +160,16 @@ class DrawResult(Base):
     receiver_name: Mapped[str] = mapped_column(String(100), nullable=False)
 
     # Relationships
-    game: Mapped["Game"] = relationship("Game", back_populates="draw_results")
+    # Exporters run synchronously over loaded rows; fail loudly instead of
+    # lazy-loading the parent game per result
+    game: Mapped["Game"] = relationship(
+        "Game", back_populates="draw_results", lazy="raise"
+    )
+
+    __table_args__ = (
+        # Serves a game's results ordered by giver without a sort
+        Index("ix_draw_results_game_giver", "game_id", "giver_name"),
+    )
 
     def __repr__(self):
         return (
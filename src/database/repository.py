@@ -1,15 +1,106 @@
 import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import delete, event, exists, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import Session, selectinload
 
-from .models import DrawResult, Game, Participant
+from .models import DrawResult, Game, Participant, utc_now
 
 logger = logging.getLogger(__name__)
 
+# Recent get_game_by_code results shared by every session in the process:
+# game_code -> (expires_at, GameSnapshot). Writes through this repository
+# drop the affected entries when they happen and again once they commit;
+# the TTL bounds staleness from anything else (e.g. other processes)
+GAME_CACHE_TTL = 10  # seconds
+GAME_CACHE_SIZE = 1024
+_game_cache: Dict[str, Tuple[float, "GameSnapshot"]] = {}
+# Bumped on every invalidation; a read that overlapped one doesn't cache
+_cache_generation = 0
+# session.info key: games written in the session's open transaction
+_STALE_GAMES_KEY = "stale_games"
+
+
+@dataclass(frozen=True, slots=True)
+class GameSnapshot:
+    """Read-only copy of a games row, safe to share between sessions"""
+
+    id: int
+    game_code: str
+    creator_chat_id: int
+    is_locked: bool
+    is_drawn: bool
+    created_at: datetime
+    auto_purge_at: Optional[datetime]
+
+    @classmethod
+    def from_game(cls, game):
+        return cls(
+            id=game.id,
+            game_code=game.game_code,
+            creator_chat_id=game.creator_chat_id,
+            is_locked=game.is_locked,
+            is_drawn=game.is_drawn,
+            created_at=game.created_at,
+            auto_purge_at=game.auto_purge_at,
+        )
+
+
+def _remember_game(game, generation):
+    """
+    Return a snapshot of game, caching it unless the cache was invalidated
+    since generation was read
+    """
+    snapshot = GameSnapshot.from_game(game)
+    if generation != _cache_generation:
+        return snapshot
+
+    _game_cache.pop(snapshot.game_code, None)
+    if len(_game_cache) >= GAME_CACHE_SIZE:
+        # Dicts keep insertion order, so the first key is the oldest
+        del _game_cache[next(iter(_game_cache))]
+    _game_cache[snapshot.game_code] = (time.monotonic() + GAME_CACHE_TTL, snapshot)
+    return snapshot
+
+
+def _forget_game(game_id=None, game_code=None):
+    """
+    Drop the cached snapshot of game_id or game_code, or every snapshot
+    """
+    global _cache_generation
+    _cache_generation += 1
+
+    if game_code is not None:
+        _game_cache.pop(game_code, None)
+        return
+
+    if game_id is None:
+        _game_cache.clear()
+        return
+
+    for code, (_, snapshot) in list(_game_cache.items()):
+        if snapshot.id == game_id:
+            del _game_cache[code]
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_written_games(session):
+    """
+    Drop snapshots of games the finished transaction wrote.
+
+    Other sessions may have cached the old row between the write and the
+    commit; a rollback may leave a snapshot of the discarded change
+    """
+    for game_id, game_code in session.info.pop(_STALE_GAMES_KEY, ()):
+        _forget_game(game_id, game_code)
+
 
 class GameRepository:
     """Handles all database operations separately from the main app logic"""
@@ -17,44 +108,80 @@ class GameRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create_game(self, game_code, creator_chat_id, auto_purge_at=None):
+    def _invalidate_game(self, game_id=None, game_code=None):
+        """
+        Drop the game's cached snapshot now and again when the transaction ends
+        """
+        _forget_game(game_id, game_code)
+        self.session.info.setdefault(_STALE_GAMES_KEY, []).append((game_id, game_code))
+
+    def _may_cache(self):
+        """
+        Whether rows read in this session may go into the shared cache
+
+        Not replica rows (they may lag) and not while the session has
+        uncommitted game writes of its own
+        """
+        return not (
+            self.session.info.get("read_only")
+            or self.session.info.get(_STALE_GAMES_KEY)
+        )
+
+    async def create_game(
+        self, game_code, creator_chat_id, auto_purge_at=None, auto_purge_after=None
+    ):
         """
-        Create a new Secret Santa game
+        Create a new Secret Santa game.
+
+        auto_purge_after (a timedelta) sets auto_purge_at relative to now
         """
+        if auto_purge_after is not None:
+            auto_purge_at = utc_now() + auto_purge_after
+
         game = Game(
             game_code=game_code,
             creator_chat_id=creator_chat_id,
             auto_purge_at=auto_purge_at,
         )
         self.session.add(game)
-        await self.session.flush()  # Ensure data is written to DB
-        await self.session.refresh(game)  # Refresh to get ID from DB
-
-        logger.info(f"Created game: {game.game_code} (ID: {game.id})")
+        # id and created_at come back with the INSERT (eager_defaults)
+        await self.session.flush()
 
-        # Verify game was created
-        verification = await self.get_game_by_code(game_code)
-        if verification:
-            logger.info(f"Game creation verified in DB: {game_code}")
-        else:
-            logger.error(f"Game creation FAILED verification: {game_code}")
+        logger.info("Created game: %s (ID: %s)", game.game_code, game.id)
 
+        # Not cached: the game only exists once the session commits
         return game
 
     async def get_game_by_code(self, game_code):
         """
-        Retrieve a game by its unique code
+        Retrieve a game by its unique code (case-insensitive).
+
+        Returns a GameSnapshot (read-only, possibly cached for a few
+        seconds); change games through the repository methods, by id
         """
+        game_code = game_code.upper()
+        cached = _game_cache.get(game_code)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        generation = _cache_generation if self._may_cache() else None
         stmt = select(Game).where(Game.game_code == game_code)
         result = await self.session.execute(stmt)
         game = result.scalar_one_or_none()
 
         if game:
-            logger.debug(f"Found game: {game_code}")
-        else:
-            logger.debug(f"Game not found: {game_code}")
+            logger.debug("Found game: %s", game_code)
+            return _remember_game(game, generation)
 
-        return game
+        logger.debug("Game not found: %s", game_code)
+        return None
+
+    async def get_existing_codes(self, game_codes):
+        """
+        Return the subset of game_codes already used by a game, as a set
+        """
+        stmt = select(Game.game_code).where(Game.game_code.in_(game_codes))
+        return set((await self.session.scalars(stmt)).all())
 
     async def get_game_by_id(self, game_id):
         """
@@ -74,14 +201,69 @@ class GameRepository:
         )
         self.session.add(participant)
         try:
+            # id and joined_at come back with the INSERT (eager_defaults)
             await self.session.flush()
-            await self.session.refresh(participant)
-            logger.info(f"Added participant '{name}' to game ID {game_id}")
+            logger.info("Added participant '%s' to game ID %s", name, game_id)
             return participant
         except Exception as e:
-            logger.error(f"Failed to add participant '{name}': {e}")
+            logger.error("Failed to add participant '%s': %s", name, e)
             raise
 
+    async def add_participant_if_absent(self, game_id, name):
+        """
+        Add a participant unless the game already has one by that name
+        (ignoring case), in a single INSERT ... ON CONFLICT DO NOTHING.
+
+        Returns the new Participant, or None for a duplicate name
+        """
+        connection = await self.session.connection()
+        if connection.dialect.name == "postgresql":
+            dialect_insert = postgresql_insert
+        elif connection.dialect.name == "sqlite":
+            dialect_insert = sqlite_insert
+        else:
+            if await self.participant_exists(game_id, name):
+                return None
+            return await self.add_participant(game_id, name)
+
+        # Either unique index (exact or lower-cased name) turns the INSERT
+        # into a no-op, so racing joins can't both get in
+        stmt = (
+            dialect_insert(Participant)
+            .values(game_id=game_id, name=name)
+            .on_conflict_do_nothing()
+            .returning(Participant)
+        )
+        participant = (await self.session.scalars(stmt)).one_or_none()
+
+        if participant is None:
+            logger.info("Participant '%s' already in game ID %s", name, game_id)
+        else:
+            logger.info("Added participant '%s' to game ID %s", name, game_id)
+        return participant
+
+    async def add_participants_bulk(self, game_id, names):
+        """
+        Add several participants to a game with a single INSERT.
+
+        Returns the new participant IDs in the order of names
+        """
+        if not names:
+            return []
+
+        stmt = (
+            insert(Participant)
+            .values([{"game_id": game_id, "name": name} for name in names])
+            .returning(Participant.id)
+        )
+        participant_ids = (await self.session.scalars(stmt)).all()
+
+        logger.info(
+            "Added %s participants to game ID %s",
+            len(participant_ids), game_id,
+        )
+        return participant_ids
+
     async def get_participants(self, game_id):
         """
         Get all participants in a game.
@@ -89,25 +271,41 @@ class GameRepository:
         stmt = (
             select(Participant)
             .where(Participant.game_id == game_id)
-            .order_by(Participant.joined_at)
+            # joined_at has second resolution on SQLite; id breaks ties
+            .order_by(Participant.joined_at, Participant.id)
         )
-        result = await self.session.execute(stmt)
-        participants = list(result.scalars().all())
+        participants = (await self.session.scalars(stmt)).all()
 
         logger.debug(
-            f"Retrieved {len(participants)} participants for game ID {game_id}"
+            "Retrieved %s participants for game ID %s",
+            len(participants), game_id,
         )
         return participants
 
+    async def get_participant_names(self, game_id):
+        """
+        Get participant names in join order without loading ORM objects
+        """
+        stmt = (
+            select(Participant.name)
+            .where(Participant.game_id == game_id)
+            .order_by(Participant.joined_at, Participant.id)
+        )
+        return (await self.session.scalars(stmt)).all()
+
     async def participant_exists(self, game_id, name):
         """
-        Check if a participant with given name exists in the game
+        Check if a participant with given name exists in the game,
+        ignoring case
         """
-        stmt = select(Participant).where(
-            Participant.game_id == game_id, Participant.name == name
+        stmt = select(
+            exists().where(
+                Participant.game_id == game_id,
+                func.lower(Participant.name) == func.lower(name),
+            )
         )
         result = await self.session.execute(stmt)
-        return result.scalar_one_or_none() is not None
+        return bool(result.scalar())
 
     async def lock_game(self, game_id):
         """
@@ -115,7 +313,46 @@ class GameRepository:
         """
         stmt = update(Game).where(Game.id == game_id).values(is_locked=True)
         await self.session.execute(stmt)
-        logger.info(f"Locked game ID {game_id}")
+        self._invalidate_game(game_id)
+        logger.info("Locked game ID %s", game_id)
+
+    async def try_lock_game(self, game_id, min_participants):
+        """
+        Lock a game only if it is still open and has at least
+        min_participants participants, in a single UPDATE.
+
+        Returns True if the game was locked by this call
+        """
+        participant_count = (
+            select(func.count())
+            .where(Participant.game_id == Game.id)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Game)
+            .where(
+                Game.id == game_id,
+                Game.is_locked.is_(False),
+                participant_count >= min_participants,
+            )
+            .values(is_locked=True)
+            .returning(Game.id)
+        )
+        locked = (await self.session.execute(stmt)).first() is not None
+        self._invalidate_game(game_id)
+
+        if locked:
+            logger.info("Locked game ID %s", game_id)
+        return locked
+
+    async def unlock_game(self, game_id):
+        """
+        Unlock a game so new participants can join again
+        """
+        stmt = update(Game).where(Game.id == game_id).values(is_locked=False)
+        await self.session.execute(stmt)
+        self._invalidate_game(game_id)
+        logger.info("Unlocked game ID %s", game_id)
 
     async def mark_game_as_drawn(self, game_id):
         """
@@ -123,78 +360,112 @@ class GameRepository:
         """
         stmt = update(Game).where(Game.id == game_id).values(is_drawn=True)
         await self.session.execute(stmt)
-        logger.info(f"Marked game ID {game_id} as drawn")
+        self._invalidate_game(game_id)
+        logger.info("Marked game ID %s as drawn", game_id)
 
     async def save_draw_results(self, game_id, results):
         """
         Save Secret Santa draw results
+
+        On asyncpg the pairs are streamed with COPY in one round-trip;
+        other backends use a single executemany INSERT.
+        Returns the number of saved pairs.
         """
-        draw_results = []
+        # Run the UPDATE first: it opens the driver-level transaction,
+        # so the raw COPY below commits or rolls back with the session
+        await self.mark_game_as_drawn(game_id)
 
-        for giver_name, receiver_name in results.items():
-            draw_result = DrawResult(
-                game_id=game_id,
-                giver_name=giver_name,
-                receiver_name=receiver_name,
+        if not results:
+            logger.info("Saved 0 draw results for game ID %s", game_id)
+            return 0
+
+        connection = await self.session.connection()
+
+        if connection.dialect.driver == "asyncpg":
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                DrawResult.__tablename__,
+                records=[
+                    (game_id, giver_name, receiver_name)
+                    for giver_name, receiver_name in results.items()
+                ],
+                columns=["game_id", "giver_name", "receiver_name"],
+            )
+        else:
+            await self.session.execute(
+                insert(DrawResult),
+                [
+                    {"game_id": game_id, "giver_name": giver_name, "receiver_name": receiver_name}
+                    for giver_name, receiver_name in results.items()
+                ],
             )
-            self.session.add(draw_result)
-            draw_results.append(draw_result)
 
-        await self.session.flush()
+        logger.info("Saved %s draw results for game ID %s", len(results), game_id)
+        return len(results)
 
-        await self.mark_game_as_drawn(game_id)
+    async def replace_draw_results(self, game_id, results):
+        """
+        Replace a game's draw results with new ones.
 
-        logger.info(f"Saved {len(draw_results)} draw results for game ID {game_id}")
-        return draw_results
+        The DELETE and the insert run in the session's transaction, so
+        readers see either the old pairs or the new ones, never neither
+        """
+        stmt = delete(DrawResult).where(DrawResult.game_id == game_id)
+        await self.session.execute(stmt)
+
+        return await self.save_draw_results(game_id, results)
 
     async def get_draw_results(self, game_id):
         """
-        Get all draw results for a game
+        Get all draw results for a game.
+
+        Names are stored on the rows themselves, so exporters never touch
+        a relationship and there is nothing to eager-load
         """
         stmt = (
             select(DrawResult)
             .where(DrawResult.game_id == game_id)
             .order_by(DrawResult.giver_name)
         )
-        result = await self.session.execute(stmt)
-        draw_results = list(result.scalars().all())
+        draw_results = (await self.session.scalars(stmt)).all()
 
         logger.debug(
-            f"Retrieved {len(draw_results)} draw results for game ID {game_id}"
+            "Retrieved %s draw results for game ID %s",
+            len(draw_results), game_id,
         )
         return draw_results
 
-    async def delete_game(self, game_id):
+    async def delete_game(self, game_id, game_code=None):
         """
         Delete a game and all related data (participants, draw results)
-        """
-        # First delete participants
-        stmt_participants = delete(Participant).where(Participant.game_id == game_id)
-        await self.session.execute(stmt_participants)
-
-        # Then delete draw results
-        stmt_draw_results = delete(DrawResult).where(DrawResult.game_id == game_id)
-        await self.session.execute(stmt_draw_results)
 
-        # Finally delete the game itself
+        If game_code is given, only delete the game while it still has it
+        """
+        # Participants and draw results reference games.id with
+        # ON DELETE CASCADE (SQLite enforces it via PRAGMA foreign_keys)
         stmt = delete(Game).where(Game.id == game_id)
+        if game_code is not None:
+            stmt = stmt.where(Game.game_code == game_code)
         result = await self.session.execute(stmt)
+        self._invalidate_game(game_id)
 
         deleted = result.rowcount > 0
 
         if deleted:
-            logger.info(f"Deleted game ID {game_id} and all related data")
+            logger.info("Deleted game ID %s and all related data", game_id)
         else:
-            logger.warning(f"Game ID {game_id} not found for deletion")
+            logger.warning("Game ID %s not found for deletion", game_id)
 
         return deleted
-    
-    async def get_expired_games(self, current_time):
+
+    async def get_expired_games(self, current_time=None):
         """
-        Get all games that have passed their auto-purge date
+        Get all games that have passed their auto-purge date.
+
+        current_time is naive UTC, like auto_purge_at; defaults to now
         """
         if current_time is None:
-            current_time = datetime.utcnow()
+            current_time = utc_now()
 
         stmt = (
             select(Game)
@@ -203,38 +474,104 @@ class GameRepository:
                 Game.auto_purge_at <= current_time
             )
         )
-        result = await self.session.execute(stmt)
-        expired_games = list(result.scalars().all())
+        expired_games = (await self.session.scalars(stmt)).all()
 
-        logger.debug(f"Found {len(expired_games)} expired games")
+        logger.debug("Found %s expired games", len(expired_games))
         return expired_games
-    
+
+    async def purge_expired_games(self, current_time=None):
+        """
+        Delete every game past its auto-purge date in one statement.
+
+        Related rows go with ON DELETE CASCADE. current_time is naive UTC,
+        like auto_purge_at; defaults to now. Returns the purged game codes
+        """
+        if current_time is None:
+            current_time = utc_now()
+
+        stmt = (
+            delete(Game)
+            .where(
+                Game.auto_purge_at.isnot(None),
+                Game.auto_purge_at <= current_time
+            )
+            .returning(Game.game_code)
+        )
+        purged_codes = (await self.session.scalars(stmt)).all()
+        for purged_code in purged_codes:
+            self._invalidate_game(game_code=purged_code)
+
+        logger.info("Purged %s expired games", len(purged_codes))
+        return purged_codes
+
     async def get_game_with_participants(self, game_code):
         """
         Get a game with all its participants eagerly loaded
+
+        Unlike get_game_by_code this returns the ORM Game (never cached),
+        since the participants come with it
         """
         stmt = (
             select(Game)
-            .where(Game.game_code == game_code)
+            .where(Game.game_code == game_code.upper())
             .options(selectinload(Game.participants))
         )
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
-    
+
     async def get_game_stats(self, game_id):
         """
         Get statistics for a game.
         """
-        participants = await self.get_participants(game_id)
-        draw_results = await self.get_draw_results(game_id)
+        # Both counts in one round-trip, without loading any rows
+        stmt = select(
+            select(func.count())
+            .where(Participant.game_id == game_id)
+            .scalar_subquery()
+            .label("participant_count"),
+            select(func.count())
+            .where(DrawResult.game_id == game_id)
+            .scalar_subquery()
+            .label("draw_count"),
+        )
+        result = await self.session.execute(stmt)
+        participant_count, draw_count = result.one()
 
         return {
-            "participant_count": len(participants),
-            "draw_count": len(draw_results),
+            "participant_count": participant_count,
+            "draw_count": draw_count,
         }
 
+    async def get_game_with_stats(self, game_code):
+        """
+        Get a game by code together with its statistics in one query.
 
-
-         
-
-
+        Returns (game, stats) with game a GameSnapshot, as from
+        get_game_by_code, and stats shaped like get_game_stats; or
+        (None, None) when there is no such game
+        """
+        generation = _cache_generation if self._may_cache() else None
+
+        # The count subqueries correlate to the outer games row
+        stmt = select(
+            Game,
+            select(func.count())
+            .where(Participant.game_id == Game.id)
+            .scalar_subquery()
+            .label("participant_count"),
+            select(func.count())
+            .where(DrawResult.game_id == Game.id)
+            .scalar_subquery()
+            .label("draw_count"),
+        ).where(Game.game_code == game_code.upper())
+        row = (await self.session.execute(stmt)).one_or_none()
+
+        if row is None:
+            return None, None
+
+        game, participant_count, draw_count = row
+
+        return _remember_game(game, generation), {
+            "participant_count": participant_count,
+            "draw_count": draw_count,
+        }
@@ -0,0 +1,23 @@
+"""Shared parsing for "/command CODE [rest]" messages"""
+
+import re
+
+# "/command", "/command@BotName", then an optional game code and the rest
+_CMD_RE = re.compile(r"^/(\w+)(?:@\S+)?(?:\s+(\S+))?(?:\s+(\S.*?))?\s*$", re.DOTALL)
+
+
+def parse_command(text):
+    """
+    Split a command message into (command, game_code, rest).
+
+    game_code is upper-cased; missing parts are None
+    """
+    match = _CMD_RE.match(text or "")
+    if not match:
+        return None, None, None
+
+    command, game_code, rest = match.groups()
+    if game_code:
+        game_code = game_code.upper()
+
+    return command, game_code, rest
@@ -0,0 +1,70 @@
+"""Shared game lookup and ownership checks for organizer-only commands"""
+
+import functools
+import logging
+
+from src.database import get_session, GameRepository
+
+logger = logging.getLogger(__name__)
+
+GAME_NOT_FOUND_TEMPLATE = (
+    "❌ <b>Гра не знайдена</b>\n\n"
+    "Гра з кодом <code>{game_code}</code> не існує."
+)
+
+
+def requires_game(
+    *, denied_text, failure_text, not_found_text=GAME_NOT_FOUND_TEMPLATE, with_stats=False
+):
+    """
+    Load the game for an organizer-only command.
+
+    The decorated coroutine is called as handler(message, user, game,
+    repository) inside an open session, only when the game exists and
+    user created it; with_stats=True fetches the get_game_stats counts in
+    the same query and passes them as a fifth argument. Lookup misses,
+    foreign users and unexpected errors are answered here with the given
+    texts (not_found_text may use {game_code}); command-specific status
+    checks stay in the handler
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(message, user, game_code):
+            logger.info(
+                "User %s (ID: %s) calling %s for game %s",
+                user.username or user.first_name, user.id, handler.__name__, game_code,
+            )
+
+            try:
+                async with get_session() as session:
+                    repository = GameRepository(session)
+
+                    if with_stats:
+                        game, stats = await repository.get_game_with_stats(game_code)
+                    else:
+                        game = await repository.get_game_by_code(game_code)
+
+                    if not game:
+                        await message.answer(not_found_text.format(game_code=game_code))
+                        return
+
+                    if game.creator_chat_id != user.id:
+                        await message.answer(denied_text)
+                        return
+
+                    if with_stats:
+                        await handler(message, user, game, repository, stats)
+                    else:
+                        await handler(message, user, game, repository)
+
+            except Exception as e:
+                logger.error(
+                    "Error in %s for game %s: %s",
+                    handler.__name__, game_code, e, exc_info=True,
+                )
+                await message.answer(failure_text)
+
+        return wrapper
+
+    return decorator
@@ -1,11 +1,12 @@
 """Button handler for keyboard interactions"""
 
 import logging
+from types import MappingProxyType
+
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
 from utils.keyboards import get_main_menu_keyboard
 
 logger = logging.getLogger(__name__)
@@ -23,6 +24,11 @@ class GameCodeInput(StatesGroup):
 from . import game_creation, game_join, game_lock, draw, game_export, game_purge
 
 
+# Bound format methods for the per-call parts of the "use last code" button
+_use_last_code_text = "✅ Використати {code}".format
+_use_last_code_data = "use_last_code:{command}:{code}".format
+
+
 async def get_last_game_code_keyboard(state: FSMContext, command_type: str):
     """
     Get inline keyboard with last used game code if available
@@ -31,287 +37,198 @@ async def get_last_game_code_keyboard(state: FSMContext, command_type: str):
     last_code = data.get("last_game_code")
 
     if last_code:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.row(
-            InlineKeyboardButton(
-                text=f"✅ Використати {last_code}",
-                callback_data=f"use_last_code:{command_type}:{last_code}"
-            )
-        )
-        keyboard.row(
-            InlineKeyboardButton(
-                text="📝 Ввести інший код",
-                callback_data=f"enter_new_code:{command_type}"
-            )
-        )
-        return keyboard.as_markup()
+        return InlineKeyboardMarkup(inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text=_use_last_code_text(code=last_code),
+                    callback_data=_use_last_code_data(command=command_type, code=last_code)
+                )
+            ],
+            [ENTER_NEW_CODE_BUTTONS[command_type]],
+        ])
     return None
 
 
-@router.message(F.text == "🆕 Створити гру")
-async def button_new_game(message: types.Message):
-    """Handle new game button"""
-    await game_creation.cmd_new(message)
-
-
-@router.message(F.text == "❓ Допомога")
-async def button_help(message: types.Message):
-    """Handle help button"""
-    await game_creation.cmd_help(message)
-
-
-@router.message(F.text == "🏠 Головне меню")
-async def button_main_menu(message: types.Message):
-    """Handle main menu button"""
-    await game_creation.cmd_start(message)
-
-
-@router.message(F.text == "➕ Приєднатись")
-async def button_join(message: types.Message, state: FSMContext):
-    """Handle join button"""
-    await state.set_state(GameCodeInput.waiting_for_join_data)
-    await message.answer(
-        "📝 <b>Приєднання до гри</b>\n\n"
-        "Введіть код гри та ваше ім'я через пробіл:\n\n"
-        "<b>Приклад:</b>\n"
-        "<code>SANTA42 Ваше_Ім'я</code>",
-        parse_mode="HTML"
+# Reply-keyboard buttons that map straight onto a command handler
+SIMPLE_BUTTONS = MappingProxyType({
+    "🆕 Створити гру": game_creation.cmd_new,
+    "❓ Допомога": game_creation.cmd_help,
+    "🏠 Головне меню": game_creation.cmd_start,
+})
+
+# Buttons for commands that need a game code, mapped to the command type
+GAME_CODE_BUTTONS = MappingProxyType({
+    "📋 Список учасників": "list",
+    "ℹ️ Інфо про гру": "info",
+    "🔒 Заблокувати": "lock",
+    "🔓 Розблокувати": "unlock",
+    "🎲 Жеребкування": "draw",
+    "📤 Експорт": "export",
+    "🗑 Видалити гру": "purge",
+})
+
+# Prompt titles and handlers per command type
+COMMAND_NAMES = {
+    "list": "Список учасників",
+    "info": "Інформація про гру",
+    "lock": "Блокування гри",
+    "unlock": "Розблокування гри",
+    "draw": "Жеребкування",
+    "export": "Експорт результатів",
+    "purge": "Видалення гри",
+}
+
+# Static prompt texts and buttons, rendered once at import. Messages are
+# sent without parse_mode: the bot defaults to HTML (see src/bot.py)
+CHOOSE_CODE_PROMPTS = {
+    command_type: (
+        f"📝 <b>{name}</b>\n\n"
+        "Використати останній код гри або ввести новий?"
     )
+    for command_type, name in COMMAND_NAMES.items()
+}
+
+ENTER_CODE_PROMPT = (
+    "📝 <b>{name}</b>\n\n"
+    "Введіть код гри:\n\n"
+    "<b>Приклад:</b> <code>SANTA42</code>"
+)
+
+ENTER_CODE_PROMPTS = {
+    command_type: ENTER_CODE_PROMPT.format(name=name)
+    for command_type, name in COMMAND_NAMES.items()
+}
+
+JOIN_PROMPT = (
+    "📝 <b>Приєднання до гри</b>\n\n"
+    "Введіть код гри та ваше ім'я через пробіл:\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>SANTA42 Ваше_Ім'я</code>"
+)
+
+JOIN_FORMAT_ERROR = (
+    "❌ <b>Неправильний формат</b>\n\n"
+    "Потрібно ввести код гри та ваше ім'я через пробіл.\n\n"
+    "<b>Приклад:</b> <code>SANTA42 Іван</code>"
+)
+
+UNKNOWN_MESSAGE_TEXT = (
+    "🤔 <b>Не зрозумів вашу команду</b>\n\n"
+    "Скористайтесь кнопками нижче або подивіться список доступних команд:\n"
+    "❓ /help\n\n"
+    "Або натисніть кнопку <b>❓ Допомога</b>"
+)
+
+ENTER_NEW_CODE_BUTTONS = {
+    command_type: InlineKeyboardButton(
+        text="📝 Ввести інший код",
+        callback_data=f"enter_new_code:{command_type}"
+    )
+    for command_type in COMMAND_NAMES
+}
 
+# Core command functions, called as handler(message, user, game_code)
+COMMAND_HANDLERS = MappingProxyType({
+    "list": game_join.process_list,
+    "info": game_purge.process_info,
+    "lock": game_lock.process_lock,
+    "unlock": game_lock.process_unlock,
+    "draw": draw.process_draw,
+    "export": game_export.process_export,
+    "purge": game_purge.process_purge,
+})
 
-@router.message(F.text == "📋 Список учасників")
-async def button_list(message: types.Message, state: FSMContext):
-    """Handle list button"""
-    await state.update_data(command_type="list")
-
-    # Check if there's a last used game code
-    keyboard = await get_last_game_code_keyboard(state, "list")
-
-    if keyboard:
-        await message.answer(
-            "📝 <b>Список учасників</b>\n\n"
-            "Використати останній код гри або ввести новий?",
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
-    else:
-        await state.set_state(GameCodeInput.waiting_for_code)
-        await message.answer(
-            "📝 <b>Список учасників</b>\n\n"
-            "Введіть код гри:\n\n"
-            "<b>Приклад:</b> <code>SANTA42</code>",
-            parse_mode="HTML"
-        )
-
-
-@router.message(F.text == "ℹ️ Інфо про гру")
-async def button_info(message: types.Message, state: FSMContext):
-    """Handle info button"""
-    await state.update_data(command_type="info")
-    keyboard = await get_last_game_code_keyboard(state, "info")
-
-    if keyboard:
-        await message.answer(
-            "📝 <b>Інформація про гру</b>\n\n"
-            "Використати останній код гри або ввести новий?",
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
-    else:
-        await state.set_state(GameCodeInput.waiting_for_code)
-        await message.answer(
-            "📝 <b>Інформація про гру</b>\n\n"
-            "Введіть код гри:\n\n"
-            "<b>Приклад:</b> <code>SANTA42</code>",
-            parse_mode="HTML"
-        )
-
-
-@router.message(F.text == "🔒 Заблокувати")
-async def button_lock(message: types.Message, state: FSMContext):
-    """Handle lock button"""
-    await state.update_data(command_type="lock")
-    keyboard = await get_last_game_code_keyboard(state, "lock")
-
-    if keyboard:
-        await message.answer(
-            "📝 <b>Блокування гри</b>\n\n"
-            "Використати останній код гри або ввести новий?",
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
-    else:
-        await state.set_state(GameCodeInput.waiting_for_code)
-        await message.answer(
-            "📝 <b>Блокування гри</b>\n\n"
-            "Введіть код гри:\n\n"
-            "<b>Приклад:</b> <code>SANTA42</code>",
-            parse_mode="HTML"
-        )
 
+JOIN_BUTTON = "➕ Приєднатись"
 
-@router.message(F.text == "🔓 Розблокувати")
-async def button_unlock(message: types.Message, state: FSMContext):
-    """Handle unlock button"""
-    await state.update_data(command_type="unlock")
-    keyboard = await get_last_game_code_keyboard(state, "unlock")
+# Every reply-keyboard label, matched with a single set lookup
+BUTTON_TEXTS = frozenset(SIMPLE_BUTTONS) | frozenset(GAME_CODE_BUTTONS) | {JOIN_BUTTON}
 
-    if keyboard:
-        await message.answer(
-            "📝 <b>Розблокування гри</b>\n\n"
-            "Використати останній код гри або ввести новий?",
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
-    else:
-        await state.set_state(GameCodeInput.waiting_for_code)
-        await message.answer(
-            "📝 <b>Розблокування гри</b>\n\n"
-            "Введіть код гри:\n\n"
-            "<b>Приклад:</b> <code>SANTA42</code>",
-            parse_mode="HTML"
-        )
 
+@router.message(F.text.in_(BUTTON_TEXTS))
+async def button_pressed(message: types.Message, state: FSMContext):
+    """Handle a reply-keyboard button press"""
+    handler = SIMPLE_BUTTONS.get(message.text)
+    if handler is not None:
+        await handler(message)
+        return
 
-@router.message(F.text == "🎲 Жеребкування")
-async def button_draw(message: types.Message, state: FSMContext):
-    """Handle draw button"""
-    await state.update_data(command_type="draw")
-    keyboard = await get_last_game_code_keyboard(state, "draw")
-
-    if keyboard:
-        await message.answer(
-            "📝 <b>Жеребкування</b>\n\n"
-            "Використати останній код гри або ввести новий?",
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
+    command_type = GAME_CODE_BUTTONS.get(message.text)
+    if command_type is None:
+        await button_join(message, state)
     else:
-        await state.set_state(GameCodeInput.waiting_for_code)
-        await message.answer(
-            "📝 <b>Жеребкування</b>\n\n"
-            "Введіть код гри:\n\n"
-            "<b>Приклад:</b> <code>SANTA42</code>",
-            parse_mode="HTML"
-        )
+        await button_game_command(message, state, command_type)
 
 
-@router.message(F.text == "📤 Експорт")
-async def button_export(message: types.Message, state: FSMContext):
-    """Handle export button"""
-    await state.update_data(command_type="export")
-    keyboard = await get_last_game_code_keyboard(state, "export")
+async def button_join(message: types.Message, state: FSMContext):
+    """Handle join button"""
+    await state.set_state(GameCodeInput.waiting_for_join_data)
+    await message.answer(JOIN_PROMPT)
 
-    if keyboard:
-        await message.answer(
-            "📝 <b>Експорт результатів</b>\n\n"
-            "Використати останній код гри або ввести новий?",
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
-    else:
-        await state.set_state(GameCodeInput.waiting_for_code)
-        await message.answer(
-            "📝 <b>Експорт результатів</b>\n\n"
-            "Введіть код гри:\n\n"
-            "<b>Приклад:</b> <code>SANTA42</code>",
-            parse_mode="HTML"
-        )
 
+async def button_game_command(message: types.Message, state: FSMContext, command_type: str):
+    """Handle buttons for commands that need a game code"""
+    await state.update_data(command_type=command_type)
 
-@router.message(F.text == "🗑 Видалити гру")
-async def button_purge(message: types.Message, state: FSMContext):
-    """Handle purge button"""
-    await state.update_data(command_type="purge")
-    keyboard = await get_last_game_code_keyboard(state, "purge")
+    # Check if there's a last used game code
+    keyboard = await get_last_game_code_keyboard(state, command_type)
 
     if keyboard:
-        await message.answer(
-            "📝 <b>Видалення гри</b>\n\n"
-            "Використати останній код гри або ввести новий?",
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
+        await message.answer(CHOOSE_CODE_PROMPTS[command_type], reply_markup=keyboard)
     else:
         await state.set_state(GameCodeInput.waiting_for_code)
-        await message.answer(
-            "📝 <b>Видалення гри</b>\n\n"
-            "Введіть код гри:\n\n"
-            "<b>Приклад:</b> <code>SANTA42</code>",
-            parse_mode="HTML"
-        )
+        await message.answer(ENTER_CODE_PROMPTS[command_type])
 
 
 @router.callback_query(F.data.startswith("use_last_code:"))
 async def callback_use_last_code(callback: types.CallbackQuery, state: FSMContext):
     """Handle using last game code"""
-    parts = callback.data.split(":")
-    command_type = parts[1]
-    game_code = parts[2]
+    _, _, rest = callback.data.partition(":")
+    command_type, _, game_code = rest.partition(":")
 
     await callback.answer()
     await callback.message.delete()
 
-    # Create a modified message with the command, using callback.from_user
-    modified_message = callback.message.model_copy(update={
-        "text": f"/{command_type} {game_code}",
-        "from_user": callback.from_user
-    })
-
-    logger.info(f"Using last code from button: /{command_type} {game_code}")
+    logger.info("Using last code from button: /%s %s", command_type, game_code)
 
-    # Call appropriate handler
-    await execute_command(command_type, game_code, modified_message, state)
+    # Reply in the callback's chat; the acting user is the one who pressed
+    await execute_command(
+        command_type, game_code, callback.message, callback.from_user, state
+    )
 
 
 @router.callback_query(F.data.startswith("enter_new_code:"))
 async def callback_enter_new_code(callback: types.CallbackQuery, state: FSMContext):
     """Handle entering new game code"""
-    command_type = callback.data.split(":")[1]
+    _, _, command_type = callback.data.partition(":")
 
     await callback.answer()
     await callback.message.delete()
 
     await state.set_state(GameCodeInput.waiting_for_code)
 
-    command_names = {
-        "list": "Список учасників",
-        "info": "Інформація про гру",
-        "lock": "Блокування гри",
-        "unlock": "Розблокування гри",
-        "draw": "Жеребкування",
-        "export": "Експорт результатів",
-        "purge": "Видалення гри"
-    }
-
-    await callback.message.answer(
-        f"📝 <b>{command_names.get(command_type, 'Введіть код гри')}</b>\n\n"
-        f"Введіть код гри:\n\n"
-        f"<b>Приклад:</b> <code>SANTA42</code>",
-        parse_mode="HTML"
-    )
+    prompt = ENTER_CODE_PROMPTS.get(command_type)
+    if prompt is None:
+        prompt = ENTER_CODE_PROMPT.format(name="Введіть код гри")
+
+    await callback.message.answer(prompt)
 
 
-async def execute_command(command_type: str, game_code: str, message: types.Message, state: FSMContext):
+async def execute_command(
+    command_type: str,
+    game_code: str,
+    message: types.Message,
+    user: types.User,
+    state: FSMContext,
+):
     """Execute command and save last game code"""
     # Save last game code for future use
     await state.update_data(last_game_code=game_code)
 
     # Call appropriate handler based on command type
-    if command_type == "list":
-        await game_join.cmd_list(message)
-    elif command_type == "info":
-        await game_purge.cmd_info(message)
-    elif command_type == "lock":
-        await game_lock.cmd_lock(message)
-    elif command_type == "unlock":
-        await game_lock.cmd_unlock(message)
-    elif command_type == "draw":
-        await draw.cmd_draw(message)
-    elif command_type == "export":
-        await game_export.cmd_export(message)
-    elif command_type == "purge":
-        await game_purge.cmd_purge(message)
+    handler = COMMAND_HANDLERS.get(command_type)
+    if handler is not None:
+        await handler(message, user, game_code)
 
 
 @router.message(GameCodeInput.waiting_for_code)
@@ -324,13 +241,10 @@ async def process_game_code(message: types.Message, state: FSMContext):
     # Clear state
     await state.clear()
 
-    # Create a modified message with the command
-    modified_message = message.model_copy(update={"text": f"/{command_type} {game_code}"})
-
-    logger.info(f"Processing command from button: /{command_type} {game_code}")
+    logger.info("Processing command from button: /%s %s", command_type, game_code)
 
     # Execute command and save last game code
-    await execute_command(command_type, game_code, modified_message, state)
+    await execute_command(command_type, game_code, message, message.from_user, state)
 
 
 @router.message(GameCodeInput.waiting_for_join_data)
@@ -340,13 +254,7 @@ async def process_join_data(message: types.Message, state: FSMContext):
     parts = message.text.strip().split(maxsplit=1)
     if len(parts) < 2:
         await state.clear()
-        await message.answer(
-            "❌ <b>Неправильний формат</b>\n\n"
-            "Потрібно ввести код гри та ваше ім'я через пробіл.\n\n"
-            "<b>Приклад:</b> <code>SANTA42 Іван</code>",
-            parse_mode="HTML",
-            reply_markup=get_main_menu_keyboard()
-        )
+        await message.answer(JOIN_FORMAT_ERROR, reply_markup=get_main_menu_keyboard())
         return
 
     game_code = parts[0].upper()
@@ -356,13 +264,10 @@ async def process_join_data(message: types.Message, state: FSMContext):
     await state.update_data(last_game_code=game_code)
     await state.clear()
 
-    # Create a modified message with the join command
-    modified_message = message.model_copy(update={"text": f"/join {game_code} {name}"})
-
-    logger.info(f"Processing join command from button: /join {game_code} {name}")
+    logger.info("Processing join command from button: /join %s %s", game_code, name)
 
     # Call join handler
-    await game_join.cmd_join(modified_message)
+    await game_join.process_join(message, message.from_user, game_code, name)
 
 
 @router.message(~F.text.startswith('/'))
@@ -371,13 +276,6 @@ async def handle_unknown_message(message: types.Message):
     Handle any unknown text messages (fallback handler)
     Only processes non-command messages
     """
-    logger.info(f"Unknown message from user {message.from_user.id}: {message.text}")
-
-    await message.answer(
-        "🤔 <b>Не зрозумів вашу команду</b>\n\n"
-        "Скористайтесь кнопками нижче або подивіться список доступних команд:\n"
-        "❓ /help\n\n"
-        "Або натисніть кнопку <b>❓ Допомога</b>",
-        parse_mode="HTML",
-        reply_markup=get_main_menu_keyboard()
-    )
+    logger.info("Unknown message from user %s: %s", message.from_user.id, message.text)
+
+    await message.answer(UNKNOWN_MESSAGE_TEXT, reply_markup=get_main_menu_keyboard())
@@ -1,8 +1,9 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from aiogram import Router, types
 from aiogram.filters import Command
+from aiogram.utils.formatting import Bold, Code, Text
 
 from src.database import get_session, GameRepository
 from utils.code_generator import generate_game_code
@@ -10,10 +11,91 @@ from utils.keyboards import get_main_menu_keyboard
 
 logger = logging.getLogger(__name__)
 
-router = Router(name="game_creation")
-
 # Configuration
 AUTO_PURGE_DAYS = 30
+AUTO_PURGE_AFTER = timedelta(days=AUTO_PURGE_DAYS)
+
+# Static reply texts, built once at import. The Text ones are sent as
+# plain text plus entities, so Telegram has no HTML to parse
+CREATE_FAILED_TEXT = (
+    "❌ <b>Помилка створення гри</b>\n\n"
+    "Щось пішло не так. Спробуйте ще раз або зв'яжіться з підтримкою."
+)
+
+WELCOME_BODY = Text(
+    "Вітаю в боті Secret Santa! 🎁\n\n",
+    "Я допоможу організувати таємний обмін подарунками ",
+    "серед друзів, колег чи команди.\n\n",
+    Bold("📋 Доступні команди:"), "\n\n",
+    "🆕 ", Code("/new"), " - створити нову гру\n",
+    "➕ ", Code("/join CODE ІМ'Я"), " - приєднатися до гри\n",
+    "🔒 ", Code("/lock CODE"), " - закрити набір учасників\n",
+    "🎲 ", Code("/draw CODE"), " - провести жеребкування\n",
+    "📤 ", Code("/export CODE"), " - отримати результати\n",
+    "🗑 ", Code("/purge CODE"), " - видалити гру\n\n",
+    Bold("❓ Як це працює:"), "\n\n",
+    "1. Організатор створює гру командою /new\n",
+    "2. Учасники приєднуються за кодом гри\n",
+    "3. Організатор блокує набір і проводить жеребкування\n",
+    "4. Кожен учасник дізнається, кому дарувати подарунок\n\n",
+    "🔒 ", Bold("Конфіденційність:"), " бот не зберігає особисті дані - ",
+    "лише імена учасників!\n\n",
+    "Почніть зі створення гри: /new",
+)
+
+HELP_CONTENT = Text(
+    "📚 ", Bold("Довідка Secret Santa Bot"), "\n\n",
+
+    Bold("🆕 Створення гри:"), "\n",
+    Code("/new"), "\n",
+    "Створює нову гру та генерує унікальний код.\n\n",
+
+    Bold("➕ Приєднання до гри:"), "\n",
+    Code("/join SANTA42 Іван"), "\n",
+    "Приєднує учасника з ім'ям 'Іван' до гри SANTA42.\n",
+    "⚠️ Ім'я має бути унікальним в рамках гри.\n\n",
+
+    Bold("🔒 Закриття набору:"), "\n",
+    Code("/lock SANTA42"), "\n",
+    "Блокує гру - нові учасники не зможуть приєднатися.\n",
+    "Потрібно мінімум 3 учасники.\n",
+    "📝 Цю команду може виконати тільки організатор.\n\n",
+
+    Bold("🎲 Жеребкування:"), "\n",
+    Code("/draw SANTA42"), "\n",
+    "Проводить жеребкування і визначає, хто кому дарує.\n",
+    "📝 Тільки для організатора заблокованої гри.\n\n",
+
+    Bold("📤 Експорт результатів:"), "\n",
+    Code("/export SANTA42"), "\n",
+    "Отримати результати у текстовому форматі або CSV.\n",
+    "📝 Тільки для організатора після жеребкування.\n\n",
+
+    Bold("🗑 Видалення гри:"), "\n",
+    Code("/purge SANTA42"), "\n",
+    "Остаточно видаляє гру та всі дані.\n",
+    "📝 Тільки для організатора.\n\n",
+
+    Bold("🔐 Конфіденційність:"), "\n",
+    "• Бот не зберігає номери телефонів чи email\n",
+    "• Зберігаються тільки імена учасників\n",
+    "• Ігри автоматично видаляються через 30 днів\n",
+    "• Результати жеребкування бачить тільки організатор\n\n",
+
+    Bold("💡 Поради:"), "\n",
+    "• Використовуйте прості та зрозумілі імена\n",
+    "• Мінімум 3 учасники для жеребкування\n",
+    "• Збережіть код гри в безпечному місці\n",
+    "• Після завершення видаліть гру командою /purge\n\n",
+
+    "❓ Питання? Пишіть @your_support_bot",
+)
+
+# text, entities and parse_mode=None, rendered once for every /help
+HELP_KWARGS = HELP_CONTENT.as_kwargs()
+
+router = Router(name="game_creation")
+
 
 @router.message(Command("new"))
 async def cmd_new(message):
@@ -24,7 +106,7 @@ async def cmd_new(message):
     user_id = message.from_user.id
     username = message.from_user.username or message.from_user.first_name
 
-    logger.info(f"User {username} (ID: {user_id}) is creating a new game")
+    logger.info("User %s (ID: %s) is creating a new game", username, user_id)
 
     try:
         async with get_session() as session:
@@ -33,19 +115,16 @@ async def cmd_new(message):
             # Generate unique game code
             game_code = await generate_game_code(session, prefix_list=None, suffix_length=None)
 
-            # Calculate auto-purge date
-            auto_purge_at = datetime.utcnow() + timedelta(days=AUTO_PURGE_DAYS)
-            
-            # Create game in database
+            # Create game in database; the repository sets auto_purge_at
             game = await repository.create_game(
                 game_code=game_code,
                 creator_chat_id=user_id,
-                auto_purge_at=auto_purge_at
+                auto_purge_after=AUTO_PURGE_AFTER
             )
 
             logger.info(
-                f"Game created: {game_code} by user {username} "
-                f"(will auto-purge at {auto_purge_at.date()})"
+                "Game created: %s by user %s (will auto-purge at %s)",
+                game_code, username, game.auto_purge_at.date(),
             )
 
             # Send success message
@@ -68,14 +147,9 @@ async def cmd_new(message):
             )
 
     except Exception as e:
-        logger.error(f"Error creating game: {e}", exc_info=True)
-
-        error_text = (
-            "❌ <b>Помилка створення гри</b>\n\n"
-            "Щось пішло не так. Спробуйте ще раз або зв'яжіться з підтримкою."
-        )
+        logger.error("Error creating game: %s", e, exc_info=True)
 
-        await message.answer(error_text, parse_mode="HTML")
+        await message.answer(CREATE_FAILED_TEXT, parse_mode="HTML")
 
 
 @router.message(Command("start"))
@@ -86,31 +160,11 @@ async def cmd_start(message):
 
     username = message.from_user.first_name or "друже"
 
-    welcome_text = (
-        f"🎅 <b>Привіт, {username}!</b>\n\n"
-        "Вітаю в боті Secret Santa! 🎁\n\n"
-        "Я допоможу організувати таємний обмін подарунками "
-        "серед друзів, колег чи команди.\n\n"
-        "<b>📋 Доступні команди:</b>\n\n"
-        "🆕 <code>/new</code> - створити нову гру\n"
-        "➕ <code>/join CODE ІМ'Я</code> - приєднатися до гри\n"
-        "🔒 <code>/lock CODE</code> - закрити набір учасників\n"
-        "🎲 <code>/draw CODE</code> - провести жеребкування\n"
-        "📤 <code>/export CODE</code> - отримати результати\n"
-        "🗑 <code>/purge CODE</code> - видалити гру\n\n"
-        "<b>❓ Як це працює:</b>\n\n"
-        "1. Організатор створює гру командою /new\n"
-        "2. Учасники приєднуються за кодом гри\n"
-        "3. Організатор блокує набір і проводить жеребкування\n"
-        "4. Кожен учасник дізнається, кому дарувати подарунок\n\n"
-        "🔒 <b>Конфіденційність:</b> бот не зберігає особисті дані - "
-        "лише імена учасників!\n\n"
-        "Почніть зі створення гри: /new"
-    )
+    # Only the greeting varies; the name is sent as text, never as markup
+    content = Text("🎅 ", Bold("Привіт, ", username, "!"), "\n\n", WELCOME_BODY)
 
     await message.answer(
-        welcome_text,
-        parse_mode="HTML",
+        **content.as_kwargs(),
         reply_markup=get_main_menu_keyboard()
     )
 
@@ -123,62 +177,7 @@ async def cmd_help(message: types.Message) -> None:
     Args:
         message: Telegram message object
     """
-    help_text = (
-        "📚 <b>Довідка Secret Santa Bot</b>\n\n"
-        
-        "<b>🆕 Створення гри:</b>\n"
-        "<code>/new</code>\n"
-        "Створює нову гру та генерує унікальний код.\n\n"
-        
-        "<b>➕ Приєднання до гри:</b>\n"
-        "<code>/join SANTA42 Іван</code>\n"
-        "Приєднує учасника з ім'ям 'Іван' до гри SANTA42.\n"
-        "⚠️ Ім'я має бути унікальним в рамках гри.\n\n"
-        
-        "<b>🔒 Закриття набору:</b>\n"
-        "<code>/lock SANTA42</code>\n"
-        "Блокує гру - нові учасники не зможуть приєднатися.\n"
-        "Потрібно мінімум 3 учасники.\n"
-        "📝 Цю команду може виконати тільки організатор.\n\n"
-        
-        "<b>🎲 Жеребкування:</b>\n"
-        "<code>/draw SANTA42</code>\n"
-        "Проводить жеребкування і визначає, хто кому дарує.\n"
-        "📝 Тільки для організатора заблокованої гри.\n\n"
-        
-        "<b>📤 Експорт результатів:</b>\n"
-        "<code>/export SANTA42</code>\n"
-        "Отримати результати у текстовому форматі або CSV.\n"
-        "📝 Тільки для організатора після жеребкування.\n\n"
-        
-        "<b>🗑 Видалення гри:</b>\n"
-        "<code>/purge SANTA42</code>\n"
-        "Остаточно видаляє гру та всі дані.\n"
-        "📝 Тільки для організатора.\n\n"
-        
-        "<b>🔐 Конфіденційність:</b>\n"
-        "• Бот не зберігає номери телефонів чи email\n"
-        "• Зберігаються тільки імена учасників\n"
-        "• Ігри автоматично видаляються через 30 днів\n"
-        "• Результати жеребкування бачить тільки організатор\n\n"
-        
-        "<b>💡 Поради:</b>\n"
-        "• Використовуйте прості та зрозумілі імена\n"
-        "• Мінімум 3 учасники для жеребкування\n"
-        "• Збережіть код гри в безпечному місці\n"
-        "• Після завершення видаліть гру командою /purge\n\n"
-        
-        "❓ Питання? Пишіть @your_support_bot"
-    )
-    
     await message.answer(
-        help_text,
-        parse_mode="HTML",
+        **HELP_KWARGS,
         reply_markup=get_main_menu_keyboard()
     )
-
-
-
-
-
-
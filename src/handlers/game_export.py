@@ -1,140 +1,256 @@
 import logging
+import time
 
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.types import BufferedInputFile, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.utils.formatting import Bold, Code, Pre, Text
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
 from src.database import get_session, GameRepository
 from services.export_service import ExportService, ExportFormatter
+from ._commands import parse_command
+from ._guards import requires_game
 
 logger = logging.getLogger(__name__)
 
+# Static reply texts, built once at import
+EXPORT_USAGE_TEXT = (
+    "❌ <b>Неправильний формат команди</b>\n\n"
+    "Використовуйте: <code>/export КОД_ГРИ</code>\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>/export SANTA42</code>"
+)
+
+EXPORT_ACCESS_DENIED_TEXT = (
+    "🚫 <b>Доступ заборонено</b>\n\n"
+    "Тільки організатор гри може експортувати результати.\n\n"
+    "Це необхідно для збереження конфіденційності результатів."
+)
+
+RESULTS_MISSING_TEXT = (
+    "❌ <b>Результати не знайдено</b>\n\n"
+    "Щось пішло не так. Спробуйте провести жеребкування знову."
+)
+
+EXPORT_FAILED_TEXT = (
+    "❌ <b>Помилка експорту</b>\n\n"
+    "Щось пішло не так. Спробуйте ще раз."
+)
+
+NOT_DRAWN_TEMPLATE = (
+    "⏳ <b>Жеребкування ще не проведено</b>\n\n"
+    "Спочатку проведіть жеrebкування:\n"
+    "<code>/draw {game_code}</code>"
+)
+
+VALIDATION_FAILED_TEMPLATE = (
+    "⚠️ <b>Помилка валідації</b>\n\n"
+    "Результати не пройшли перевірку: {validation_msg}\n\n"
+    "Спробуйте перепровести жеребкування: <code>/redraw {game_code}</code>"
+)
+
 router = Router(name="game_export")
 
+# Recent export reads: (game_code, user_id) -> (expires_at, results).
+# Pressing several format buttons in a row reuses one DB read
+EXPORT_CACHE_TTL = 60  # seconds
+EXPORT_CACHE_SIZE = 1024
+_export_cache = {}
+
+# Rendered exports: game_code -> (expires_at, {"text": answer() kwargs,
+# "csv": bytes, "table": answer() kwargs}). /redraw and purge drop them
+# early; the TTL matches _export_cache so nothing outlives the results
+_export_artifacts = {}
+
+# Bumped on every invalidation; a read that overlapped one doesn't cache
+_export_generation = 0
+# session.info key: game codes whose results the open transaction changed
+_STALE_EXPORTS_KEY = "stale_exports"
+
+
+def _remember_export_results(game_code, user_id, results):
+    """
+    Cache results the owner is allowed to export
+    """
+    key = (game_code, user_id)
+    _export_cache.pop(key, None)
+    if len(_export_cache) >= EXPORT_CACHE_SIZE:
+        # Dicts keep insertion order, so the first key is the oldest
+        del _export_cache[next(iter(_export_cache))]
+    _export_cache[key] = (time.monotonic() + EXPORT_CACHE_TTL, results)
+
+
+async def _load_export_results(game_code, user_id):
+    """
+    Get draw results for game_code, or None if user_id does not own the game
+    """
+    cached = _export_cache.get((game_code, user_id))
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    generation = _export_generation
+    async with get_session() as session:
+        repository = GameRepository(session)
+
+        game = await repository.get_game_by_code(game_code)
+
+        if not game or game.creator_chat_id != user_id:
+            return None
+
+        results = await repository.get_draw_results(game.id)
+
+    if generation == _export_generation:
+        _remember_export_results(game_code, user_id, results)
+    return results
+
+
+def _get_export_artifact(game_code, kind, build, generation):
+    """
+    Return the rendered export of the given kind, building it on first use
+
+    generation is _export_generation from before the results were loaded;
+    if the cache was invalidated since, the export is built but not kept
+    """
+    if generation != _export_generation:
+        return build()
+
+    now = time.monotonic()
+    cached = _export_artifacts.get(game_code)
+    if cached is not None and cached[0] > now:
+        artifacts = cached[1]
+    else:
+        _export_artifacts.pop(game_code, None)
+        if len(_export_artifacts) >= EXPORT_CACHE_SIZE:
+            del _export_artifacts[next(iter(_export_artifacts))]
+        artifacts = {}
+        _export_artifacts[game_code] = (now + EXPORT_CACHE_TTL, artifacts)
+
+    artifact = artifacts.get(kind)
+    if artifact is None:
+        artifact = artifacts[kind] = build()
+    return artifact
+
+
+def _export_keyboard(game_code):
+    """
+    Build the export format buttons for game_code
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="📄 Текст", callback_data="export_text:" + game_code),
+            InlineKeyboardButton(text="📊 CSV", callback_data="export_csv:" + game_code),
+        ],
+        [
+            InlineKeyboardButton(text="📋 Таблиця", callback_data="export_table:" + game_code),
+        ],
+    ])
+
+
+def _forget_export(game_code=None):
+    """
+    Drop cached results and renders for game_code, or for every game
+    """
+    global _export_generation
+    _export_generation += 1
+
+    if game_code is None:
+        _export_cache.clear()
+        _export_artifacts.clear()
+        return
+
+    for key in [key for key in _export_cache if key[0] == game_code]:
+        del _export_cache[key]
+    _export_artifacts.pop(game_code, None)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_written_exports(session):
+    """
+    Drop exports of games whose results the finished transaction changed.
+
+    An export read from another session before the commit still sees, and
+    may have cached, the old results
+    """
+    for game_code in session.info.pop(_STALE_EXPORTS_KEY, ()):
+        _forget_export(game_code)
+
+
+def invalidate_export_cache(session, game_code=None):
+    """
+    Forget cached exports for game_code, or for every game, now and again
+    when session's transaction ends
+    """
+    _forget_export(game_code)
+    session.info.setdefault(_STALE_EXPORTS_KEY, []).append(game_code)
+
 
 @router.message(Command("export"))
 async def cmd_export(message):
     """
     Handle /export command to export draw results
     """
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
-
     # Parse command
-    parts = message.text.split(maxsplit=1)
-
-    if len(parts) < 2:
-        error_text = (
-            "❌ <b>Неправильний формат команди</b>\n\n"
-            "Використовуйте: <code>/export КОД_ГРИ</code>\n\n"
-            "<b>Приклад:</b>\n"
-            "<code>/export SANTA42</code>"
-        )
-        await message.answer(error_text, parse_mode="HTML")
+    _, game_code, _ = parse_command(message.text)
+
+    if not game_code:
+        await message.answer(EXPORT_USAGE_TEXT, parse_mode="HTML")
         return
 
-    game_code = parts[1].upper()
+    await process_export(message, message.from_user, game_code)
 
-    logger.info(
-        f"User {username} (ID: {user_id}) requesting export for game {game_code}"
-    )
 
-    try:
-        async with get_session() as session:
-            repository = GameRepository(session)
-
-            # Check if game exists
-            game = await repository.get_game_by_code(game_code)
-
-            if not game:
-                error_text = (
-                    f"❌ <b>Гра не знайдена</b>\n\n"
-                    f"Гра з кодом <code>{game_code}</code> не існує."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-
-            # Check if user is the creator
-            if game.creator_chat_id != user_id:
-                error_text = (
-                    "🚫 <b>Доступ заборонено</b>\n\n"
-                    "Тільки організатор гри може експортувати результати.\n\n"
-                    "Це необхідно для збереження конфіденційності результатів."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-
-            # Check if draw has been performed
-            if not game.is_drawn:
-                error_text = (
-                    "⏳ <b>Жеребкування ще не проведено</b>\n\n"
-                    "Спочатку проведіть жеrebкування:\n"
-                    f"<code>/draw {game_code}</code>"
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-
-            # Get draw results
-            results = await repository.get_draw_results(game.id)
-
-            if not results:
-                error_text = (
-                    "❌ <b>Результати не знайдено</b>\n\n"
-                    "Щось пішло не так. Спробуйте провести жеребкування знову."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-
-            logger.info(f"Exporting {len(results)} results for game {game_code}")
-
-            # Validate results
-            is_valid, validation_msg = ExportService.validate_results(results)
-            if not is_valid:
-                logger.error(f"Invalid results for game {game_code}: {validation_msg}")
-                error_text = (
-                    f"⚠️ <b>Помилка валідації</b>\n\n"
-                    f"Результати не пройшли перевірку: {validation_msg}\n\n"
-                    "Спробуйте перепровести жеребкування: <code>/redraw {game_code}</code>"
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-
-            # Create inline keyboard with export options
-            keyboard = InlineKeyboardBuilder()
-            keyboard.row(
-                InlineKeyboardButton(
-                    text="📄 Текст", callback_data=f"export_text:{game_code}"
-                ),
-                InlineKeyboardButton(
-                    text="📊 CSV", callback_data=f"export_csv:{game_code}"
-                ),
-            )
-            keyboard.row(
-                InlineKeyboardButton(
-                    text="📋 Таблиця", callback_data=f"export_table:{game_code}"
-                )
-            )
-
-            response_text = (
-                f"📤 <b>Експорт результатів</b>\n\n"
-                f"🎮 Гра: <code>{game_code}</code>\n"
-                f"🎁 Пар: <b>{len(results)}</b>\n\n"
-                "Оберіть формат експорту:"
-            )
-
-            await message.answer(
-                response_text, parse_mode="HTML", reply_markup=keyboard.as_markup()
-            )
+@requires_game(denied_text=EXPORT_ACCESS_DENIED_TEXT, failure_text=EXPORT_FAILED_TEXT)
+async def process_export(message, user, game, repository):
+    """
+    Offer export formats for game to user; replies go to message's chat
+    """
+    game_code = game.game_code
 
-    except Exception as e:
-        logger.error(f"Error exporting game {game_code}: {e}", exc_info=True)
+    # Check if draw has been performed
+    if not game.is_drawn:
+        await message.answer(NOT_DRAWN_TEMPLATE.format(game_code=game_code), parse_mode="HTML")
+        return
 
-        error_text = (
-            "❌ <b>Помилка експорту</b>\n\n" "Щось пішло не так. Спробуйте ще раз."
+    # Get draw results
+    results = await repository.get_draw_results(game.id)
+
+    if not results:
+        await message.answer(RESULTS_MISSING_TEXT, parse_mode="HTML")
+        return
+
+    logger.info("Exporting %s results for game %s", len(results), game_code)
+
+    # Validate results
+    is_valid, validation_msg = ExportService.validate_results(results)
+    if not is_valid:
+        logger.error(
+            "Invalid results for game %s: %s",
+            game_code, validation_msg,
+        )
+        await message.answer(
+            VALIDATION_FAILED_TEMPLATE.format(
+                validation_msg=validation_msg, game_code=game_code
+            ),
+            parse_mode="HTML",
         )
+        return
+
+    # The format buttons pressed next can reuse these results
+    _remember_export_results(game_code, user.id, results)
 
-        await message.answer(error_text, parse_mode="HTML")
+    response_text = (
+        f"📤 <b>Експорт результатів</b>\n\n"
+        f"🎮 Гра: <code>{game_code}</code>\n"
+        f"🎁 Пар: <b>{len(results)}</b>\n\n"
+        "Оберіть формат експорту:"
+    )
+
+    await message.answer(
+        response_text, parse_mode="HTML", reply_markup=_export_keyboard(game_code)
+    )
 
 
 @router.callback_query(F.data.startswith("export_text:"))
@@ -142,35 +258,38 @@ async def callback_export_text(callback):
     """
     Handle text export callback
     """
-    game_code = callback.data.split(":")[1]
+    _, _, game_code = callback.data.partition(":")
     user_id = callback.from_user.id
 
     try:
-        async with get_session() as session:
-            repository = GameRepository(session)
-
-            game = await repository.get_game_by_code(game_code)
-
-            if not game or game.creator_chat_id != user_id:
-                await callback.answer("❌ Доступ заборонено", show_alert=True)
-                return
-
-            results = await repository.get_draw_results(game.id)
-
-            # Generate text export
-            export_text = ExportService.generate_text_export(results, game_code)
+        generation = _export_generation
+        results = await _load_export_results(game_code, user_id)
+
+        if results is None:
+            await callback.answer("❌ Доступ заборонено", show_alert=True)
+            return
+
+        # Generate text export (results are already ordered by giver name)
+        # as a pre block; entities carry the formatting, so participant
+        # names never need HTML escaping
+        export_message = _get_export_artifact(
+            game_code,
+            "text",
+            lambda: Pre(
+                ExportService.generate_text_export(results, game_code, presorted=True)
+            ).as_kwargs(),
+            generation,
+        )
 
-            # Send as regular message
-            await callback.message.answer(
-                f"<pre>{export_text}</pre>", parse_mode="HTML"
-            )
+        # Send as regular message
+        await callback.message.answer(**export_message)
 
-            await callback.answer("✅ Експортовано як текст")
+        await callback.answer("✅ Експортовано як текст")
 
-            logger.info(f"Text export completed for game {game_code}")
+        logger.info("Text export completed for game %s", game_code)
 
     except Exception as e:
-        logger.error(f"Error in text export callback: {e}", exc_info=True)
+        logger.error("Error in text export callback: %s", e, exc_info=True)
         await callback.answer("❌ Помилка експорту", show_alert=True)
 
 
@@ -179,47 +298,47 @@ async def callback_export_csv(callback):
     """
     Handle CSV export callback
     """
-    game_code = callback.data.split(":")[1]
+    _, _, game_code = callback.data.partition(":")
     user_id = callback.from_user.id
 
     try:
-        async with get_session() as session:
-            repository = GameRepository(session)
-
-            game = await repository.get_game_by_code(game_code)
-
-            if not game or game.creator_chat_id != user_id:
-                await callback.answer("❌ Доступ заборонено", show_alert=True)
-                return
-
-            results = await repository.get_draw_results(game.id)
-
-            # Generate CSV export
-            csv_data = ExportService.generate_csv_export(results)
-
-            # Create file
-            file = BufferedInputFile(
-                csv_data.read(), filename=f"secret_santa_{game_code}.csv"
-            )
+        generation = _export_generation
+        results = await _load_export_results(game_code, user_id)
+
+        if results is None:
+            await callback.answer("❌ Доступ заборонено", show_alert=True)
+            return
+
+        # Generate CSV export; getvalue() hands over the BytesIO contents
+        # without an extra read pass
+        csv_bytes = _get_export_artifact(
+            game_code,
+            "csv",
+            lambda: ExportService.generate_csv_export(results, presorted=True).getvalue(),
+            generation,
+        )
 
-            # Send file
-            await callback.message.answer_document(
-                file,
-                caption=(
-                    f"📊 <b>CSV експорт</b>\n\n"
-                    f"Гра: <code>{game_code}</code>\n"
-                    f"Пар: {len(results)}\n\n"
-                    "⚠️ Зберігайте цей файл в безпечному місці!"
-                ),
-                parse_mode="HTML",
-            )
+        # Create file
+        file = BufferedInputFile(csv_bytes, filename=f"secret_santa_{game_code}.csv")
+
+        # Send file
+        await callback.message.answer_document(
+            file,
+            caption=(
+                f"📊 <b>CSV експорт</b>\n\n"
+                f"Гра: <code>{game_code}</code>\n"
+                f"Пар: {len(results)}\n\n"
+                "⚠️ Зберігайте цей файл в безпечному місці!"
+            ),
+            parse_mode="HTML",
+        )
 
-            await callback.answer("✅ CSV файл надіслано")
+        await callback.answer("✅ CSV файл надіслано")
 
-            logger.info(f"CSV export completed for game {game_code}")
+        logger.info("CSV export completed for game %s", game_code)
 
     except Exception as e:
-        logger.error(f"Error in CSV export callback: {e}", exc_info=True)
+        logger.error("Error in CSV export callback: %s", e, exc_info=True)
         await callback.answer("❌ Помилка експорту", show_alert=True)
 
 
@@ -228,36 +347,35 @@ async def callback_export_table(callback):
     """
     Handle table export callback
     """
-    game_code = callback.data.split(":")[1]
+    _, _, game_code = callback.data.partition(":")
     user_id = callback.from_user.id
 
     try:
-        async with get_session() as session:
-            repository = GameRepository(session)
-
-            game = await repository.get_game_by_code(game_code)
-
-            if not game or game.creator_chat_id != user_id:
-                await callback.answer("❌ Доступ заборонено", show_alert=True)
-                return
-
-            results = await repository.get_draw_results(game.id)
-
-            # Generate table export
-            table = ExportFormatter.format_table(results)
+        generation = _export_generation
+        results = await _load_export_results(game_code, user_id)
+
+        if results is None:
+            await callback.answer("❌ Доступ заборонено", show_alert=True)
+            return
+
+        # Generate table export as a code block for monospace formatting
+        table_message = _get_export_artifact(
+            game_code,
+            "table",
+            lambda: Text(
+                Bold("📋 Результати у вигляді таблиці"), "\n\n",
+                Pre(ExportFormatter.format_table(results, presorted=True)), "\n\n",
+                "Гра: ", Code(game_code),
+            ).as_kwargs(),
+            generation,
+        )
 
-            # Send as code block for monospace formatting
-            await callback.message.answer(
-                f"📋 <b>Результати у вигляді таблиці</b>\n\n"
-                f"<pre>{table}</pre>\n\n"
-                f"Гра: <code>{game_code}</code>",
-                parse_mode="HTML",
-            )
+        await callback.message.answer(**table_message)
 
-            await callback.answer("✅ Таблиця створена")
+        await callback.answer("✅ Таблиця створена")
 
-            logger.info(f"Table export completed for game {game_code}")
+        logger.info("Table export completed for game %s", game_code)
 
     except Exception as e:
-        logger.error(f"Error in table export callback: {e}", exc_info=True)
+        logger.error("Error in table export callback: %s", e, exc_info=True)
         await callback.answer("❌ Помилка експорту", show_alert=True)
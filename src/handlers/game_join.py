@@ -1,30 +1,94 @@
+import asyncio
 import logging
+import weakref
 from typing import Optional
 
 from aiogram import Router, types
 from aiogram.filters import Command
 
-from src.database import get_session, GameRepository
+from src.database import get_session, get_read_session, GameRepository
 from utils.validators import ParticipantNameValidator, ValidationError, sanitize_name
 from utils.keyboards import get_main_menu_keyboard
+from ._commands import parse_command
+from ._guards import GAME_NOT_FOUND_TEMPLATE
 
 logger = logging.getLogger(__name__)
 
+# Static reply texts, built once at import
+JOIN_USAGE_TEXT = (
+    "❌ <b>Неправильний формат команди</b>\n\n"
+    "Використовуйте: <code>/join КОД_ГРИ Ім'я</code>\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>/join SANTA42 Іван</code>"
+)
+
+JOIN_GAME_NOT_FOUND_TEMPLATE = (
+    "❌ <b>Гра не знайдена</b>\n\n"
+    "Гра з кодом <code>{game_code}</code> не існує.\n\n"
+    "Перевірте код або попросіть організатора створити нову гру."
+)
+
+GAME_LOCKED_TEMPLATE = (
+    "🔒 <b>Гра заблокована</b>\n\n"
+    "Гра <code>{game_code}</code> вже закрила набір учасників.\n"
+    "Нові учасники не можуть приєднатися."
+)
+
+NAME_TAKEN_TEMPLATE = (
+    "❌ <b>Ім'я вже зайняте</b>\n\n"
+    "Учасник з ім'ям '<b>{participant_name}</b>' вже є в цій грі.\n\n"
+    "Виберіть інше ім'я або додайте унікальний ідентифікатор "
+    "(наприклад, 'Іван К.' або 'Іван_2')."
+)
+
+JOIN_FAILED_TEXT = (
+    "❌ <b>Помилка приєднання до гри</b>\n\n"
+    "Щось пішло не так. Спробуйте ще раз."
+)
+
+LIST_USAGE_TEXT = (
+    "❌ <b>Неправильний формат команди</b>\n\n"
+    "Використовуйте: <code>/list КОД_ГРИ</code>\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>/list SANTA42</code>"
+)
+
+LIST_FAILED_TEXT = "❌ Помилка отримання списку учасників."
+
 router = Router(name="game_join")
 
+# One lock per game code while joins to it are in flight; entries vanish
+# once no join holds or waits on them
+_join_locks = weakref.WeakValueDictionary()
+
+
+def _join_lock(game_code):
+    """
+    Lock serializing joins to game_code within this process
+    """
+    lock = _join_locks.get(game_code)
+    if lock is None:
+        lock = _join_locks[game_code] = asyncio.Lock()
+    return lock
+
+
+def _format_participants(participants):
+    """
+    Numbered roster lines for participants, one per line
+    """
+    return "".join(f"{i}. {p.name}\n" for i, p in enumerate(participants, 1))
+
+
 def parse_join_command(text):
     """
     Parse /join command to extract game code and participant name
     """
 
-    parts = text.split(maxsplit=2)
+    _, game_code, name = parse_command(text)
     
-    if len(parts) < 3:
+    if not game_code or not name:
         return None, None
     
-    game_code = parts[1].upper()
-    name = parts[2]
-    
     return game_code, name
 
 @router.message(Command("join"))
@@ -32,28 +96,29 @@ async def cmd_join(message):
     """
     Handle /join command to add a participant to a game
     """
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
-
     # Parse command
     game_code, participant_name = parse_join_command(message.text)
     
     if not game_code or not participant_name:
-        error_text = (
-            "❌ <b>Неправильний формат команди</b>\n\n"
-            "Використовуйте: <code>/join КОД_ГРИ Ім'я</code>\n\n"
-            "<b>Приклад:</b>\n"
-            "<code>/join SANTA42 Іван</code>"
-        )
-        await message.answer(error_text, parse_mode="HTML")
+        await message.answer(JOIN_USAGE_TEXT, parse_mode="HTML")
         return
-    
+
+    await process_join(message, message.from_user, game_code, participant_name)
+
+
+async def process_join(message, user, game_code, participant_name):
+    """
+    Add user to game_code as participant_name; replies go to message's chat
+    """
+    user_id = user.id
+    username = user.username or user.first_name
+
     # Sanitize name
     participant_name = sanitize_name(participant_name)
     
     logger.info(
-        f"User {username} (ID: {user_id}) attempting to join game {game_code} "
-        f"as '{participant_name}'"
+        "User %s (ID: %s) attempting to join game %s as '%s'",
+        username, user_id, game_code, participant_name,
     )
 
     try:
@@ -70,103 +135,100 @@ async def cmd_join(message):
             await message.answer(error_text, parse_mode="HTML")
             return
         
-        async with get_session() as session:
+        # Concurrent joins to one game take turns, so each sees the
+        # previous joiner's name and the unique index is never the one to
+        # reject a duplicate
+        async with _join_lock(game_code), get_session() as session:
             repository = GameRepository(session)
 
-            # Check if game exists
-            logger.info(f"Looking up game with code: {game_code}")
-            game = await repository.get_game_by_code(game_code)
+            # Check if game exists; its participants come in the same go and
+            # serve both the duplicate check and the reply
+            logger.info("Looking up game with code: %s", game_code)
+            game = await repository.get_game_with_participants(game_code)
 
             if not game:
-                logger.warning(f"Game not found: {game_code}")
-                error_text = (
-                    f"❌ <b>Гра не знайдена</b>\n\n"
-                    f"Гра з кодом <code>{game_code}</code> не існує.\n\n"
-                    "Перевірте код або попросіть організатора створити нову гру."
+                logger.warning("Game not found: %s", game_code)
+                await message.answer(
+                    JOIN_GAME_NOT_FOUND_TEMPLATE.format(game_code=game_code), parse_mode="HTML"
                 )
-                await message.answer(error_text, parse_mode="HTML")
                 return
 
-            logger.info(f"Game found: {game_code} (ID: {game.id})")
+            logger.info("Game found: %s (ID: %s)", game_code, game.id)
             
             # Check if game is locked
             if game.is_locked:
-                error_text = (
-                    f"🔒 <b>Гра заблокована</b>\n\n"
-                    f"Гра <code>{game_code}</code> вже закрила набір учасників.\n"
-                    "Нові учасники не можуть приєднатися."
+                await message.answer(
+                    GAME_LOCKED_TEMPLATE.format(game_code=game_code), parse_mode="HTML"
                 )
-                await message.answer(error_text, parse_mode="HTML")
                 return
             
-            # Check if name already exists in this game
-            if await repository.participant_exists(game.id, participant_name):
-                error_text = (
-                    f"❌ <b>Ім'я вже зайняте</b>\n\n"
-                    f"Учасник з ім'ям '<b>{participant_name}</b>' вже є в цій грі.\n\n"
-                    "Виберіть інше ім'я або додайте унікальний ідентифікатор "
-                    "(наприклад, 'Іван К.' або 'Іван_2')."
+            participants = list(game.participants)
+
+            # Check if name already exists in this game; case variants
+            # count as the same name
+            folded_name = participant_name.casefold()
+            if any(p.name.casefold() == folded_name for p in participants):
+                await message.answer(
+                    NAME_TAKEN_TEMPLATE.format(participant_name=participant_name), parse_mode="HTML"
                 )
-                await message.answer(error_text, parse_mode="HTML")
                 return
             
-            # Add participant
-            await repository.add_participant(game.id, participant_name)
-            
-            # Get updated participant count
-            participants = await repository.get_participants(game.id)
+            # Add participant; the INSERT itself rejects a name taken since
+            # the list was loaded (e.g. by another bot process). joined_at
+            # comes back with it, and the newest joiner sorts last, so the
+            # loaded list just grows by one
+            participant = await repository.add_participant_if_absent(
+                game.id, participant_name
+            )
+            if participant is None:
+                await message.answer(
+                    NAME_TAKEN_TEMPLATE.format(participant_name=participant_name), parse_mode="HTML"
+                )
+                return
+            participants.append(participant)
             participant_count = len(participants)
             
             logger.info(
-                f"Participant '{participant_name}' added to game {game_code}. "
-                f"Total participants: {participant_count}"
+                "Participant '%s' added to game %s. Total participants: %s",
+                participant_name, game_code, participant_count,
             )
             
-            # Send success message
-            response_text = (
+            # Send success message; the pieces are joined once at the end
+            response_parts = [
                 f"🎉 <b>{participant_name}</b> приєднався до гри!\n\n"
                 f"🎮 Гра: <code>{game_code}</code>\n"
                 f"👥 Загальна кількість учасників: <b>{participant_count}</b>\n\n"
-            )
+            ]
             
             # Add hints based on participant count
             if participant_count < 3:
-                response_text += (
+                response_parts.append(
                     f"⚠️ Для жеребкування потрібно мінімум 3 учасники.\n"
                     f"Ще потрібно: {3 - participant_count}"
                 )
             else:
-                response_text += (
+                response_parts += [
                     "✅ Достатньо учасників для жеребкування!\n\n"
-                    "📋 <b>Список учасників:</b>\n"
-                )
-                for i, p in enumerate(participants, 1):
-                    response_text += f"{i}. {p.name}\n"
-                
-                response_text += (
+                    "📋 <b>Список учасників:</b>\n",
+                    _format_participants(participants),
                     f"\n💡 Коли всі приєдналися, організатор може:\n"
                     f"1. Закрити набір: <code>/lock {game_code}</code>\n"
-                    f"2. Провести жеребкування: <code>/draw {game_code}</code>"
-                )
+                    f"2. Провести жеребкування: <code>/draw {game_code}</code>",
+                ]
 
             await message.answer(
-                response_text,
+                "".join(response_parts),
                 parse_mode="HTML",
                 reply_markup=get_main_menu_keyboard()
             )
     
     except Exception as e:
         logger.error(
-            f"Error joining game {game_code} as {participant_name}: {e}",
-            exc_info=True
-        )
-        
-        error_text = (
-            "❌ <b>Помилка приєднання до гри</b>\n\n"
-            "Щось пішло не так. Спробуйте ще раз."
+            "Error joining game %s as %s: %s",
+            game_code, participant_name, e, exc_info=True,
         )
         
-        await message.answer(error_text, parse_mode="HTML")
+        await message.answer(JOIN_FAILED_TEXT, parse_mode="HTML")
 
 
 @router.message(Command("list"))
@@ -174,35 +236,33 @@ async def cmd_list(message):
     """
     Handle /list command to show participants in a game
     """
-    parts = message.text.split(maxsplit=1)
-
-    if len(parts) < 2:
-        error_text = (
-            "❌ <b>Неправильний формат команди</b>\n\n"
-            "Використовуйте: <code>/list КОД_ГРИ</code>\n\n"
-            "<b>Приклад:</b>\n"
-            "<code>/list SANTA42</code>"
-        )
-        await message.answer(error_text, parse_mode="HTML")
+    _, game_code, _ = parse_command(message.text)
+
+    if not game_code:
+        await message.answer(LIST_USAGE_TEXT, parse_mode="HTML")
         return
-    
-    game_code = parts[1].upper()
 
+    await process_list(message, message.from_user, game_code)
+
+
+async def process_list(message, user, game_code):
+    """
+    Show the participants of game_code; replies go to message's chat
+    """
     try:
-        async with get_session() as session:
+        async with get_read_session() as session:
             repository = GameRepository(session)
             
-            game = await repository.get_game_by_code(game_code)
+            # Game and participants in one go; the list is all we show
+            game = await repository.get_game_with_participants(game_code)
             
             if not game:
-                error_text = (
-                    f"❌ <b>Гра не знайдена</b>\n\n"
-                    f"Гра з кодом <code>{game_code}</code> не існує."
+                await message.answer(
+                    GAME_NOT_FOUND_TEMPLATE.format(game_code=game_code), parse_mode="HTML"
                 )
-                await message.answer(error_text, parse_mode="HTML")
                 return
             
-            participants = await repository.get_participants(game.id)
+            participants = game.participants
             
             if not participants:
                 response_text = (
@@ -214,22 +274,22 @@ async def cmd_list(message):
                 status = "🔒 Заблокована" if game.is_locked else "🔓 Відкрита"
                 drawn_status = "✅ Проведено" if game.is_drawn else "⏳ Очікує"
                 
-                response_text = (
+                response_parts = [
                     f"📋 <b>Учасники гри {game_code}</b>\n\n"
                     f"Статус: {status}\n"
                     f"Жеребкування: {drawn_status}\n"
-                    f"Всього учасників: <b>{len(participants)}</b>\n\n"
-                )
-                
-                for i, p in enumerate(participants, 1):
-                    response_text += f"{i}. {p.name}\n"
+                    f"Всього учасників: <b>{len(participants)}</b>\n\n",
+                    _format_participants(participants),
+                ]
                 
                 if not game.is_locked and len(participants) >= 3:
-                    response_text += (
+                    response_parts.append(
                         f"\n💡 Готово до жеребкування!\n"
                         f"Організатор може заблокувати гру: "
                         f"<code>/lock {game_code}</code>"
                     )
+                
+                response_text = "".join(response_parts)
 
             await message.answer(
                 response_text,
@@ -238,9 +298,5 @@ async def cmd_list(message):
             )
     
     except Exception as e:
-        logger.error(f"Error listing participants for game {game_code}: {e}")
-        error_text = "❌ Помилка отримання списку учасників."
-        await message.answer(error_text, parse_mode="HTML")
-
-
-    
\ No newline at end of file
+        logger.error("Error listing participants for game %s: %s", game_code, e)
+        await message.answer(LIST_FAILED_TEXT, parse_mode="HTML")
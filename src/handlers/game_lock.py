@@ -3,11 +3,64 @@ import logging
 from aiogram import Router, types
 from aiogram.filters import Command
 
-from src.database import get_session, GameRepository
 from services.draw_service import DrawService
+from ._commands import parse_command
+from ._guards import requires_game
 
 logger = logging.getLogger(__name__)
 
+# Static reply texts, built once at import
+LOCK_ACCESS_DENIED_TEXT = (
+    "🚫 <b>Доступ заборонено</b>\n\n"
+    "Тільки організатор гри може заблокувати набір учасників.\n\n"
+    "Якщо ви організатор, переконайтеся що використовуєте "
+    "той самий обліковий запис, з якого створили гру."
+)
+
+LOCK_FAILED_TEXT = (
+    "❌ <b>Помилка блокування гри</b>\n\n"
+    "Щось пішло не так. Спробуйте ще раз."
+)
+
+ALREADY_LOCKED_TEMPLATE = (
+    "🔒 <b>Гра вже заблокована</b>\n\n"
+    "Гра <code>{game_code}</code> вже закрила набір учасників.\n\n"
+    "Наступний крок - провести жеребкування:\n"
+    "<code>/draw {game_code}</code>"
+)
+
+UNLOCK_ACCESS_DENIED_TEXT = (
+    "🚫 <b>Доступ заборонено</b>\n\n"
+    "Тільки організатор гри може розблокувати гру."
+)
+
+UNLOCK_FAILED_TEXT = "❌ Помилка розблокування гри."
+
+LOCK_USAGE_TEXT = (
+    "❌ <b>Неправильний формат команди</b>\n\n"
+    "Використовуйте: <code>/lock КОД_ГРИ</code>\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>/lock SANTA42</code>"
+)
+
+UNLOCK_USAGE_TEXT = (
+    "❌ <b>Неправильний формат команди</b>\n\n"
+    "Використовуйте: <code>/unlock КОД_ГРИ</code>\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>/unlock SANTA42</code>"
+)
+
+UNLOCK_AFTER_DRAW_TEXT = (
+    "❌ <b>Неможливо розблокувати</b>\n\n"
+    "Жеребкування вже проведено. Змінити склад учасників неможливо.\n\n"
+    "Створіть нову гру якщо потрібно почати заново."
+)
+
+ALREADY_UNLOCKED_TEMPLATE = (
+    "🔓 <b>Гра вже розблокована</b>\n\n"
+    "Гра <code>{game_code}</code> і так відкрита для нових учасників."
+)
+
 router = Router(name="game_lock")
 
 
@@ -17,117 +70,83 @@ async def cmd_lock(message):
     Handle /lock command to lock a game and prevent new participants
 
     """
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
-    
     # Parse command
-    parts = message.text.split(maxsplit=1)
+    _, game_code, _ = parse_command(message.text)
     
-    if len(parts) < 2:
-        error_text = (
-            "❌ <b>Неправильний формат команди</b>\n\n"
-            "Використовуйте: <code>/lock КОД_ГРИ</code>\n\n"
-            "<b>Приклад:</b>\n"
-            "<code>/lock SANTA42</code>"
+    if not game_code:
+        await message.answer(LOCK_USAGE_TEXT, parse_mode="HTML")
+        return
+
+    await process_lock(message, message.from_user, game_code)
+
+
+@requires_game(denied_text=LOCK_ACCESS_DENIED_TEXT, failure_text=LOCK_FAILED_TEXT)
+async def process_lock(message, user, game, repository):
+    """
+    Lock game on behalf of user; replies go to message's chat
+    """
+    game_code = game.game_code
+    username = user.username or user.first_name
+
+    # Check if already locked
+    if game.is_locked:
+        await message.answer(
+            ALREADY_LOCKED_TEMPLATE.format(game_code=game_code), parse_mode="HTML"
         )
-        await message.answer(error_text, parse_mode="HTML")
         return
-    
-    game_code = parts[1].upper()
-    
-    logger.info(f"User {username} (ID: {user_id}) attempting to lock game {game_code}")
-    
-    try:
-        async with get_session() as session:
-            repository = GameRepository(session)
-            
-            # Check if game exists
-            game = await repository.get_game_by_code(game_code)
-            
-            if not game:
-                error_text = (
-                    f"❌ <b>Гра не знайдена</b>\n\n"
-                    f"Гра з кодом <code>{game_code}</code> не існує."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Check if user is the creator
-            if game.creator_chat_id != user_id:
-                error_text = (
-                    "🚫 <b>Доступ заборонено</b>\n\n"
-                    "Тільки організатор гри може заблокувати набір учасників.\n\n"
-                    "Якщо ви організатор, переконайтеся що використовуєте "
-                    "той самий обліковий запис, з якого створили гру."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Check if already locked
-            if game.is_locked:
-                error_text = (
-                    f"🔒 <b>Гра вже заблокована</b>\n\n"
-                    f"Гра <code>{game_code}</code> вже закрила набір учасників.\n\n"
-                    "Наступний крок - провести жеребкування:\n"
-                    f"<code>/draw {game_code}</code>"
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Get participants and check minimum count
-            participants = await repository.get_participants(game.id)
-            participant_count = len(participants)
-            
-            if participant_count < DrawService.MIN_PARTICIPANTS:
-                error_text = (
-                    f"⚠️ <b>Недостатньо учасників</b>\n\n"
-                    f"Поточна кількість: <b>{participant_count}</b>\n"
-                    f"Мінімум потрібно: <b>{DrawService.MIN_PARTICIPANTS}</b>\n\n"
-                    f"Ще потрібно: <b>{DrawService.MIN_PARTICIPANTS - participant_count}</b> "
-                    f"{'учасник' if DrawService.MIN_PARTICIPANTS - participant_count == 1 else 'учасники'}\n\n"
-                    "Запросіть більше друзів приєднатися:\n"
-                    f"<code>/join {game_code} Ім'я</code>"
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Lock the game
-            await repository.lock_game(game.id)
-            
-            logger.info(
-                f"Game {game_code} locked by user {username}. "
-                f"Participants: {participant_count}"
-            )
-            
-            # Prepare participant list
-            participant_list = "\n".join(
-                f"{i}. {p.name}" 
-                for i, p in enumerate(participants, 1)
-            )
-            
-            # Send success message
-            response_text = (
-                f"🔒 <b>Гра {game_code} заблокована!</b>\n\n"
-                f"👥 Учасників: <b>{participant_count}</b>\n\n"
-                "📋 <b>Список учасників:</b>\n"
-                f"{participant_list}\n\n"
-                "✅ Новi учасники більше не можуть приєднатися.\n\n"
-                "🎲 <b>Наступний крок - жеребкування:</b>\n"
-                f"<code>/draw {game_code}</code>\n\n"
-                "⚠️ Після жеребкування результати неможливо змінити!"
-            )
-            
-            await message.answer(response_text, parse_mode="HTML")
-    
-    except Exception as e:
-        logger.error(f"Error locking game {game_code}: {e}", exc_info=True)
-        
+
+    # Lock with one conditional UPDATE; it only applies while the game is
+    # still open and has enough participants, so races can't slip through
+    locked = await repository.try_lock_game(game.id, DrawService.MIN_PARTICIPANTS)
+
+    # The names fill the roster in the reply, or explain a refused lock
+    participant_names = await repository.get_participant_names(game.id)
+    participant_count = len(participant_names)
+
+    if not locked and participant_count >= DrawService.MIN_PARTICIPANTS:
+        # Someone else locked it since the game was looked up
+        await message.answer(
+            ALREADY_LOCKED_TEMPLATE.format(game_code=game_code), parse_mode="HTML"
+        )
+        return
+
+    if not locked:
         error_text = (
-            "❌ <b>Помилка блокування гри</b>\n\n"
-            "Щось пішло не так. Спробуйте ще раз."
+            f"⚠️ <b>Недостатньо учасників</b>\n\n"
+            f"Поточна кількість: <b>{participant_count}</b>\n"
+            f"Мінімум потрібно: <b>{DrawService.MIN_PARTICIPANTS}</b>\n\n"
+            f"Ще потрібно: <b>{DrawService.MIN_PARTICIPANTS - participant_count}</b> "
+            f"{'учасник' if DrawService.MIN_PARTICIPANTS - participant_count == 1 else 'учасники'}\n\n"
+            "Запросіть більше друзів приєднатися:\n"
+            f"<code>/join {game_code} Ім'я</code>"
         )
-        
         await message.answer(error_text, parse_mode="HTML")
+        return
+
+    logger.info(
+        "Game %s locked by user %s. Participants: %s",
+        game_code, username, participant_count,
+    )
+
+    # Prepare participant list
+    participant_list = "\n".join(
+        f"{i}. {name}"
+        for i, name in enumerate(participant_names, 1)
+    )
+
+    # Send success message
+    response_text = (
+        f"🔒 <b>Гра {game_code} заблокована!</b>\n\n"
+        f"👥 Учасників: <b>{participant_count}</b>\n\n"
+        "📋 <b>Список учасників:</b>\n"
+        f"{participant_list}\n\n"
+        "✅ Новi учасники більше не можуть приєднатися.\n\n"
+        "🎲 <b>Наступний крок - жеребкування:</b>\n"
+        f"<code>/draw {game_code}</code>\n\n"
+        "⚠️ Після жеребкування результати неможливо змінити!"
+    )
+
+    await message.answer(response_text, parse_mode="HTML")
 
 
 @router.message(Command("unlock"))
@@ -135,90 +154,47 @@ async def cmd_unlock(message):
     """
     Handle /unlock command to unlock a game (allow new participants again)
     """
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
-    
     # Parse command
-    parts = message.text.split(maxsplit=1)
+    _, game_code, _ = parse_command(message.text)
     
-    if len(parts) < 2:
-        error_text = (
-            "❌ <b>Неправильний формат команди</b>\n\n"
-            "Використовуйте: <code>/unlock КОД_ГРИ</code>\n\n"
-            "<b>Приклад:</b>\n"
-            "<code>/unlock SANTA42</code>"
+    if not game_code:
+        await message.answer(UNLOCK_USAGE_TEXT, parse_mode="HTML")
+        return
+
+    await process_unlock(message, message.from_user, game_code)
+
+
+@requires_game(denied_text=UNLOCK_ACCESS_DENIED_TEXT, failure_text=UNLOCK_FAILED_TEXT)
+async def process_unlock(message, user, game, repository):
+    """
+    Unlock game on behalf of user; replies go to message's chat
+    """
+    game_code = game.game_code
+    username = user.username or user.first_name
+
+    # Check if draw has been performed
+    if game.is_drawn:
+        await message.answer(UNLOCK_AFTER_DRAW_TEXT, parse_mode="HTML")
+        return
+
+    # Check if already unlocked
+    if not game.is_locked:
+        await message.answer(
+            ALREADY_UNLOCKED_TEMPLATE.format(game_code=game_code), parse_mode="HTML"
         )
-        await message.answer(error_text, parse_mode="HTML")
         return
-    
-    game_code = parts[1].upper()
-    
-    logger.info(f"User {username} (ID: {user_id}) attempting to unlock game {game_code}")
-    
-    try:
-        async with get_session() as session:
-            repository = GameRepository(session)
-            
-            # Check if game exists
-            game = await repository.get_game_by_code(game_code)
-            
-            if not game:
-                error_text = (
-                    f"❌ <b>Гра не знайдена</b>\n\n"
-                    f"Гра з кодом <code>{game_code}</code> не існує."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Check if user is the creator
-            if game.creator_chat_id != user_id:
-                error_text = (
-                    "🚫 <b>Доступ заборонено</b>\n\n"
-                    "Тільки організатор гри може розблокувати гру."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Check if draw has been performed
-            if game.is_drawn:
-                error_text = (
-                    "❌ <b>Неможливо розблокувати</b>\n\n"
-                    "Жеребкування вже проведено. Змінити склад учасників неможливо.\n\n"
-                    "Створіть нову гру якщо потрібно почати заново."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Check if already unlocked
-            if not game.is_locked:
-                error_text = (
-                    f"🔓 <b>Гра вже розблокована</b>\n\n"
-                    f"Гра <code>{game_code}</code> і так відкрита для нових учасників."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Unlock the game
-            from sqlalchemy import update
-            from ..database.models import Game
-            
-            stmt = update(Game).where(Game.id == game.id).values(is_locked=False)
-            await session.execute(stmt)
-            await session.commit()
-            
-            logger.info(f"Game {game_code} unlocked by user {username}")
-            
-            response_text = (
-                f"🔓 <b>Гра {game_code} розблокована!</b>\n\n"
-                "✅ Нові учасники знову можуть приєднатися:\n"
-                f"<code>/join {game_code} Ім'я</code>\n\n"
-                "Коли всі приєдналися, заблокуйте гру знову:\n"
-                f"<code>/lock {game_code}</code>"
-            )
-            
-            await message.answer(response_text, parse_mode="HTML")
-    
-    except Exception as e:
-        logger.error(f"Error unlocking game {game_code}: {e}", exc_info=True)
-        error_text = "❌ Помилка розблокування гри."
-        await message.answer(error_text, parse_mode="HTML")
\ No newline at end of file
+
+    # Unlock the game
+    await repository.unlock_game(game.id)
+
+    logger.info("Game %s unlocked by user %s", game_code, username)
+
+    response_text = (
+        f"🔓 <b>Гра {game_code} розблокована!</b>\n\n"
+        "✅ Нові учасники знову можуть приєднатися:\n"
+        f"<code>/join {game_code} Ім'я</code>\n\n"
+        "Коли всі приєдналися, заблокуйте гру знову:\n"
+        f"<code>/lock {game_code}</code>"
+    )
+
+    await message.answer(response_text, parse_mode="HTML")
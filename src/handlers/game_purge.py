@@ -1,154 +1,180 @@
 
+import hashlib
+import hmac
 import logging
-from datetime import datetime
+import secrets
 
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from ..database import get_session, GameRepository
+from ..database import get_session, get_read_session, GameRepository, utc_now
+from ._commands import parse_command
+from ._guards import GAME_NOT_FOUND_TEMPLATE, requires_game
+from .game_export import invalidate_export_cache
 
 logger = logging.getLogger(__name__)
 
+# Static reply texts, built once at import
+PURGE_GAME_NOT_FOUND_TEMPLATE = (
+    "❌ <b>Гра не знайдена</b>\n\n"
+    "Гра з кодом <code>{game_code}</code> не існує або вже видалена."
+)
+
+PURGE_ACCESS_DENIED_TEXT = (
+    "🚫 <b>Доступ заборонено</b>\n\n"
+    "Тільки організатор гри може видалити її."
+)
+
+PURGE_FAILED_TEXT = (
+    "❌ <b>Помилка</b>\n\n"
+    "Щось пішло не так. Спробуйте ще раз."
+)
+
+PURGE_USAGE_TEXT = (
+    "❌ <b>Неправильний формат команди</b>\n\n"
+    "Використовуйте: <code>/purge КОД_ГРИ</code>\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>/purge SANTA42</code>\n\n"
+    "⚠️ <b>Увага:</b> Ця дія незворотна!"
+)
+
+INFO_USAGE_TEXT = (
+    "❌ <b>Неправильний формат команди</b>\n\n"
+    "Використовуйте: <code>/info КОД_ГРИ</code>\n\n"
+    "<b>Приклад:</b>\n"
+    "<code>/info SANTA42</code>"
+)
+
+INFO_FAILED_TEXT = "❌ Помилка отримання інформації."
+
+PURGE_CONFIRM_EXPIRED_TEXT = "⌛ Підтвердження застаріло. Виконайте /purge ще раз."
+
 router = Router(name="game_purge")
 
+# Signs purge confirmation buttons so the callback can delete without
+# re-checking ownership. Per process: buttons from before a restart expire
+_PURGE_SECRET = secrets.token_bytes(32)
+
+
+def _purge_signature(game_id, game_code, user_id):
+    """
+    Short HMAC binding a purge confirmation to the game and the organizer
+    """
+    payload = f"{game_id}:{game_code}:{user_id}".encode()
+    return hmac.new(_PURGE_SECRET, payload, hashlib.sha256).hexdigest()[:16]
+
 
 @router.message(Command("purge"))
 async def cmd_purge(message):
     """
     Handle /purge command to delete a game permanently
     """
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
-    
     # Parse command
-    parts = message.text.split(maxsplit=1)
+    _, game_code, _ = parse_command(message.text)
     
-    if len(parts) < 2:
-        error_text = (
-            "❌ <b>Неправильний формат команди</b>\n\n"
-            "Використовуйте: <code>/purge КОД_ГРИ</code>\n\n"
-            "<b>Приклад:</b>\n"
-            "<code>/purge SANTA42</code>\n\n"
-            "⚠️ <b>Увага:</b> Ця дія незворотна!"
-        )
-        await message.answer(error_text, parse_mode="HTML")
+    if not game_code:
+        await message.answer(PURGE_USAGE_TEXT, parse_mode="HTML")
         return
-    
-    game_code = parts[1].upper()
-    
-    logger.info(f"User {username} (ID: {user_id}) requesting purge for game {game_code}")
-    
-    try:
-        async with get_session() as session:
-            repository = GameRepository(session)
-            
-            # Check if game exists
-            game = await repository.get_game_by_code(game_code)
-            
-            if not game:
-                error_text = (
-                    f"❌ <b>Гра не знайдена</b>\n\n"
-                    f"Гра з кодом <code>{game_code}</code> не існує або вже видалена."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Check if user is the creator
-            if game.creator_chat_id != user_id:
-                error_text = (
-                    "🚫 <b>Доступ заборонено</b>\n\n"
-                    "Тільки організатор гри може видалити її."
-                )
-                await message.answer(error_text, parse_mode="HTML")
-                return
-            
-            # Get game stats
-            stats = await repository.get_game_stats(game.id)
-            
-            # Create confirmation keyboard
-            keyboard = InlineKeyboardBuilder()
-            keyboard.row(
-                InlineKeyboardButton(
-                    text="✅ Так, видалити",
-                    callback_data=f"purge_confirm:{game_code}"
-                ),
-                InlineKeyboardButton(
-                    text="❌ Скасувати",
-                    callback_data=f"purge_cancel:{game_code}"
-                )
-            )
-            
-            # Auto-purge date info
-            purge_date_text = ""
-            if game.auto_purge_at:
-                days_until_purge = (game.auto_purge_at - datetime.utcnow()).days
-                purge_date_text = (
-                    f"📅 Автоматичне видалення: через {days_until_purge} днів\n"
-                )
-            
-            warning_text = (
-                f"⚠️ <b>Підтвердження видалення</b>\n\n"
-                f"🎮 Гра: <code>{game_code}</code>\n"
-                f"👥 Учасників: {stats['participant_count']}\n"
-                f"🎁 Результатів: {stats['draw_count']}\n"
-                f"{purge_date_text}\n"
-                f"<b>Ви впевнені що хочете видалити цю гру?</b>\n\n"
-                f"⚠️ Ця дія <b>НЕЗВОРОТНА</b>!\n"
-                f"Всі дані будуть видалені:\n"
-                f"• Список учасників\n"
-                f"• Результати жеребкування\n"
-                f"• Налаштування гри\n\n"
-                f"Відновити дані буде неможливо."
-            )
-            
-            await message.answer(
-                warning_text,
-                parse_mode="HTML",
-                reply_markup=keyboard.as_markup()
+
+    await process_purge(message, message.from_user, game_code)
+
+
+@requires_game(
+    denied_text=PURGE_ACCESS_DENIED_TEXT,
+    failure_text=PURGE_FAILED_TEXT,
+    not_found_text=PURGE_GAME_NOT_FOUND_TEMPLATE,
+    with_stats=True,
+)
+async def process_purge(message, user, game, repository, stats):
+    """
+    Ask user to confirm deleting game; replies go to message's chat
+    """
+    game_code = game.game_code
+
+    # Create confirmation keyboard; the confirm button is signed for this
+    # user, so it is built per call (without a builder round-trip)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(
+            text="✅ Так, видалити",
+            callback_data=(
+                f"purge_confirm:{game.id}:{game_code}:"
+                + _purge_signature(game.id, game_code, user.id)
             )
-    
-    except Exception as e:
-        logger.error(f"Error preparing purge for game {game_code}: {e}", exc_info=True)
-        
-        error_text = (
-            "❌ <b>Помилка</b>\n\n"
-            "Щось пішло не так. Спробуйте ще раз."
+        ),
+        InlineKeyboardButton(
+            text="❌ Скасувати",
+            callback_data=f"purge_cancel:{game_code}"
+        ),
+    ]])
+
+    # Auto-purge date info
+    purge_date_text = ""
+    if game.auto_purge_at:
+        days_until_purge = (game.auto_purge_at - utc_now()).days
+        purge_date_text = (
+            f"📅 Автоматичне видалення: через {days_until_purge} днів\n"
         )
-        
-        await message.answer(error_text, parse_mode="HTML")
+
+    warning_text = (
+        f"⚠️ <b>Підтвердження видалення</b>\n\n"
+        f"🎮 Гра: <code>{game_code}</code>\n"
+        f"👥 Учасників: {stats['participant_count']}\n"
+        f"🎁 Результатів: {stats['draw_count']}\n"
+        f"{purge_date_text}\n"
+        f"<b>Ви впевнені що хочете видалити цю гру?</b>\n\n"
+        f"⚠️ Ця дія <b>НЕЗВОРОТНА</b>!\n"
+        f"Всі дані будуть видалені:\n"
+        f"• Список учасників\n"
+        f"• Результати жеребкування\n"
+        f"• Налаштування гри\n\n"
+        f"Відновити дані буде неможливо."
+    )
+
+    await message.answer(
+        warning_text,
+        parse_mode="HTML",
+        reply_markup=keyboard
+    )
 
 
 @router.callback_query(F.data.startswith("purge_confirm:"))
 async def callback_purge_confirm(callback):
     """
     Handle purge confirmation callback
+
+    The button was signed by process_purge for the organizer, so a valid
+    signature from the same user stands in for the ownership check
     """
-    game_code = callback.data.split(":")[1]
+    parts = callback.data.split(":")
     user_id = callback.from_user.id
     username = callback.from_user.username or callback.from_user.first_name
-    
+
+    # Buttons from older bot versions carry only the game code
+    if len(parts) != 4:
+        await callback.answer(PURGE_CONFIRM_EXPIRED_TEXT, show_alert=True)
+        return
+
+    _, game_id, game_code, signature = parts
+    if not hmac.compare_digest(
+        signature, _purge_signature(game_id, game_code, user_id)
+    ):
+        await callback.answer(PURGE_CONFIRM_EXPIRED_TEXT, show_alert=True)
+        return
+
     try:
         async with get_session() as session:
             repository = GameRepository(session)
             
-            game = await repository.get_game_by_code(game_code)
-            
-            if not game:
-                await callback.answer("❌ Гра не знайдена", show_alert=True)
-                return
-            
-            if game.creator_chat_id != user_id:
-                await callback.answer("🚫 Доступ заборонено", show_alert=True)
-                return
-            
-            # Delete the game (CASCADE will delete related data)
-            deleted = await repository.delete_game(game.id)
+            # Delete the game (CASCADE will delete related data); the code
+            # guards against the id having been reused since
+            deleted = await repository.delete_game(int(game_id), game_code=game_code)
+            invalidate_export_cache(session, game_code)
             
             if deleted:
                 logger.info(
-                    f"Game {game_code} purged by user {username} (ID: {user_id})"
+                    "Game %s purged by user %s (ID: %s)",
+                    game_code, username, user_id,
                 )
                 
                 # Update message
@@ -161,10 +187,13 @@ async def callback_purge_confirm(callback):
                 
                 await callback.answer("✅ Гра видалена")
             else:
-                await callback.answer("❌ Помилка видалення", show_alert=True)
+                await callback.answer("❌ Гра не знайдена", show_alert=True)
     
     except Exception as e:
-        logger.error(f"Error confirming purge for game {game_code}: {e}", exc_info=True)
+        logger.error(
+            "Error confirming purge for game %s: %s",
+            game_code, e, exc_info=True,
+        )
         await callback.answer("❌ Помилка видалення", show_alert=True)
 
 
@@ -173,7 +202,7 @@ async def callback_purge_cancel(callback):
     """
     Handle purge cancellation callback
     """
-    game_code = callback.data.split(":")[1]
+    _, _, game_code = callback.data.partition(":")
     
     await callback.message.edit_text(
         f"✅ <b>Відмінено</b>\n\n"
@@ -194,36 +223,23 @@ async def auto_purge_expired_games():
         async with get_session() as session:
             repository = GameRepository(session)
             
-            # Get expired games
-            expired_games = await repository.get_expired_games(datetime.utcnow())
+            # Find and delete expired games in a single round-trip
+            purged_codes = await repository.purge_expired_games()
+            for purged_code in purged_codes:
+                invalidate_export_cache(session, purged_code)
             
-            if not expired_games:
+            if not purged_codes:
                 logger.info("No expired games found")
                 return 0
             
-            logger.info(f"Found {len(expired_games)} expired games")
-            
-            purged_count = 0
-            
-            for game in expired_games:
-                try:
-                    await repository.delete_game(game.id)
-                    purged_count += 1
-                    logger.info(
-                        f"Auto-purged game {game.game_code} "
-                        f"(created: {game.created_at}, purge date: {game.auto_purge_at})"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"Error auto-purging game {game.game_code}: {e}",
-                        exc_info=True
-                    )
-            
-            logger.info(f"Auto-purge completed: {purged_count}/{len(expired_games)} games purged")
-            return purged_count
+            logger.info(
+                "Auto-purge completed: %s games purged (%s)",
+                len(purged_codes), ", ".join(purged_codes),
+            )
+            return len(purged_codes)
     
     except Exception as e:
-        logger.error(f"Error in auto-purge process: {e}", exc_info=True)
+        logger.error("Error in auto-purge process: %s", e, exc_info=True)
         return 0
 
 
@@ -232,83 +248,80 @@ async def cmd_info(message: types.Message) -> None:
     """
     Handle /info command to show game information
     """
-    parts = message.text.split(maxsplit=1)
+    _, game_code, _ = parse_command(message.text)
     
-    if len(parts) < 2:
-        error_text = (
-            "❌ <b>Неправильний формат команди</b>\n\n"
-            "Використовуйте: <code>/info КОД_ГРИ</code>\n\n"
-            "<b>Приклад:</b>\n"
-            "<code>/info SANTA42</code>"
-        )
-        await message.answer(error_text, parse_mode="HTML")
+    if not game_code:
+        await message.answer(INFO_USAGE_TEXT, parse_mode="HTML")
         return
-    
-    game_code = parts[1].upper()
-    
+
+    await process_info(message, message.from_user, game_code)
+
+
+async def process_info(message, user, game_code):
+    """
+    Show information about game_code; replies go to message's chat
+    """
     try:
-        async with get_session() as session:
+        async with get_read_session() as session:
             repository = GameRepository(session)
             
-            game = await repository.get_game_by_code(game_code)
+            # Game and its counts in one query
+            game, stats = await repository.get_game_with_stats(game_code)
             
             if not game:
-                error_text = (
-                    f"❌ <b>Гра не знайдена</b>\n\n"
-                    f"Гра з кодом <code>{game_code}</code> не існує."
+                await message.answer(
+                    GAME_NOT_FOUND_TEMPLATE.format(game_code=game_code), parse_mode="HTML"
                 )
-                await message.answer(error_text, parse_mode="HTML")
                 return
             
-            stats = await repository.get_game_stats(game.id)
-            
             # Format dates
             created_date = game.created_at.strftime("%d.%m.%Y %H:%M")
             
             purge_info = "Не встановлено"
             if game.auto_purge_at:
                 purge_date = game.auto_purge_at.strftime("%d.%m.%Y")
-                days_until_purge = (game.auto_purge_at - datetime.utcnow()).days
+                days_until_purge = (game.auto_purge_at - utc_now()).days
                 purge_info = f"{purge_date} (через {days_until_purge} днів)"
             
             # Status icons
             lock_status = "🔒 Заблокована" if game.is_locked else "🔓 Відкрита"
             draw_status = "✅ Проведено" if game.is_drawn else "⏳ Не проведено"
             
-            info_text = (
-                f"ℹ️ <b>Інформація про гру</b>\n\n"
-                f"🎮 <b>Код:</b> <code>{game_code}</code>\n"
-                f"📅 <b>Створена:</b> {created_date}\n"
-                f"🗑 <b>Автовидалення:</b> {purge_info}\n\n"
-                f"<b>Статус:</b>\n"
-                f"• Набір учасників: {lock_status}\n"
-                f"• Жеребкування: {draw_status}\n\n"
-                f"<b>Статистика:</b>\n"
-                f"👥 Учасників: {stats['participant_count']}\n"
-                f"🎁 Результатів: {stats['draw_count']}\n"
-            )
-            
-            # Add action hints
+            # Action hint for the game's current stage
+            action_hint = ""
             if not game.is_locked and stats['participant_count'] >= 3:
-                info_text += (
+                action_hint = (
                     f"\n💡 <b>Доступна дія:</b>\n"
                     f"Можна заблокувати гру: <code>/lock {game_code}</code>"
                 )
             elif game.is_locked and not game.is_drawn:
-                info_text += (
+                action_hint = (
                     f"\n💡 <b>Доступна дія:</b>\n"
                     f"Можна провести жеребкування: <code>/draw {game_code}</code>"
                 )
             elif game.is_drawn:
-                info_text += (
+                action_hint = (
                     f"\n💡 <b>Доступні дії:</b>\n"
                     f"• Експортувати результати: <code>/export {game_code}</code>\n"
                     f"• Видалити гру: <code>/purge {game_code}</code>"
                 )
             
+            info_text = (
+                f"ℹ️ <b>Інформація про гру</b>\n\n"
+                f"🎮 <b>Код:</b> <code>{game_code}</code>\n"
+                f"📅 <b>Створена:</b> {created_date}\n"
+                f"🗑 <b>Автовидалення:</b> {purge_info}\n\n"
+                f"<b>Статус:</b>\n"
+                f"• Набір учасників: {lock_status}\n"
+                f"• Жеребкування: {draw_status}\n\n"
+                f"<b>Статистика:</b>\n"
+                f"👥 Учасників: {stats['participant_count']}\n"
+                f"🎁 Результатів: {stats['draw_count']}\n"
+                f"{action_hint}"
+            )
+            
             await message.answer(info_text, parse_mode="HTML")
     
     except Exception as e:
-        logger.error(f"Error getting info for game {game_code}: {e}")
-        error_text = "❌ Помилка отримання інформації."
-        await message.answer(error_text, parse_mode="HTML")
\ No newline at end of file
+        logger.error("Error getting info for game %s: %s", game_code, e)
+        await message.answer(INFO_FAILED_TEXT, parse_mode="HTML")
\ No newline at end of file
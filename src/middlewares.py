@@ -0,0 +1,76 @@
+"""Bot API request and update middlewares"""
+
+import asyncio
+import logging
+import time
+import weakref
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class SendRateLimiter(BaseRequestMiddleware):
+    """
+    Space outgoing send*/edit* calls to stay under Telegram's bot-wide limit.
+
+    Each call reserves the next free slot and sleeps until it comes up, so
+    handlers keep awaiting their own replies (and get the sent Message
+    back) while bursts are smoothed instead of rejected. A RetryAfter
+    from Telegram is waited out and the call retried once
+    """
+
+    def __init__(self, rate=30):
+        self._interval = 1 / rate
+        self._next_slot = 0.0
+
+    async def __call__(self, make_request, bot, method):
+        if not method.__api_method__.startswith(("send", "edit")):
+            return await make_request(bot, method)
+
+        # No await between reading and moving the slot, so concurrent
+        # handlers always get distinct slots
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self._interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as e:
+            logger.warning(
+                "Flood control on %s, retrying in %s s",
+                method.__api_method__, e.retry_after,
+            )
+            await asyncio.sleep(e.retry_after)
+            return await make_request(bot, method)
+
+
+class ChatSerializer(BaseMiddleware):
+    """
+    Handle one update at a time per chat.
+
+    The dispatcher runs every update in its own task, so a slow command in
+    one chat never holds up another; within a chat, commands still run in
+    the order they arrived. Register as an outer update middleware
+    """
+
+    def __init__(self):
+        # Entries vanish once no update in that chat holds or waits on them
+        self._locks = weakref.WeakValueDictionary()
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+
+        lock = self._locks.get(chat.id)
+        if lock is None:
+            lock = self._locks[chat.id] = asyncio.Lock()
+
+        async with lock:
+            return await handler(event, data)
@@ -1,3 +1,3 @@
-from .code_generator import generate_game_code
+from .code_generator import CodeGenerationError, generate_game_code
 
-__all__ = ["generate_game_code"]
\ No newline at end of file
+__all__ = ["CodeGenerationError", "generate_game_code"]
\ No newline at end of file
@@ -1,5 +1,6 @@
 import logging
 import random
+import re
 import string
 
 from src.database.repository import GameRepository
@@ -7,7 +8,11 @@ from src.database.repository import GameRepository
 logger = logging.getLogger(__name__)
 
 # Available prefixes for game codes
-PREFIXES = ["SANTA", "XMAS", "GIFT", "SNOW", "JOLLY", "MERRY"]
+PREFIXES = ("SANTA", "XMAS", "GIFT", "SNOW", "JOLLY", "MERRY")
+
+# Knowing a code is enough to join its game, so codes come from the OS
+# generator rather than the predictable Mersenne Twister
+_SYSTEM_RANDOM = random.SystemRandom()
 
 # Characters for random suffix (uppercase letters and digits)
 SUFFIX_CHARS = string.ascii_uppercase + string.digits
@@ -16,6 +21,22 @@ SUFFIX_CHARS = string.ascii_uppercase + string.digits
 MIN_SUFFIX_LENGTH = 2
 MAX_SUFFIX_LENGTH = 4
 MAX_GENERATION_ATTEMPTS = 100
+# Candidates checked against the database per round-trip
+CODE_BATCH_SIZE = 16
+
+# Whole-code format check: a known prefix, then the suffix. Longest
+# prefixes first, so one that starts another can never shadow it.
+# Case-insensitive (ASCII only), so codes needn't be upper-cased first
+_CODE_FORMAT_RE = re.compile(
+    "(?:" + "|".join(map(re.escape, sorted(PREFIXES, key=len, reverse=True))) + ")"
+    f"[A-Z0-9]{{{MIN_SUFFIX_LENGTH},{MAX_SUFFIX_LENGTH}}}\\Z",
+    re.ASCII | re.IGNORECASE,
+)
+
+
+class CodeGenerationError(RuntimeError):
+    """Raised when no unused game code could be found"""
+    pass
 
 
 async def generate_game_code(
@@ -29,23 +50,29 @@ async def generate_game_code(
     repository = GameRepository(session)
     prefixes = prefix_list or PREFIXES
 
-    for attempt in range(1, MAX_GENERATION_ATTEMPTS + 1):
-        # Generate code
-        code = _generate_code(prefixes, suffix_length)
+    for first_attempt in range(1, MAX_GENERATION_ATTEMPTS + 1, CODE_BATCH_SIZE):
+        # Generate a batch of candidates and check them in one query
+        batch_size = min(CODE_BATCH_SIZE, MAX_GENERATION_ATTEMPTS - first_attempt + 1)
+        candidates = [_generate_code(prefixes, suffix_length) for _ in range(batch_size)]
+        existing_codes = await repository.get_existing_codes(candidates)
 
-        # Check uniqueness
-        existing_game = await repository.get_game_by_code(code)
-        
-        if existing_game is None:
-            logger.info(f"Generated unique game code: {code} (attempt {attempt})")
-            return code
-        
-        logger.debug(f"Code collision: {code} (attempt {attempt})")
+        for attempt, code in enumerate(candidates, first_attempt):
+            if code not in existing_codes:
+                logger.info("Generated unique game code: %s (attempt %s)", code, attempt)
+                return code
+
+            logger.debug("Code collision: %s (attempt %s)", code, attempt)
+
+        # A whole batch taken means the short codes are filling up; the
+        # longest suffixes leave by far the most room (36^4 per prefix)
+        if suffix_length != MAX_SUFFIX_LENGTH:
+            logger.warning("Every candidate code was taken, widening suffixes")
+            suffix_length = MAX_SUFFIX_LENGTH
 
     # If we reach here, we failed to generate a unique code
     error_msg = f"Failed to generate unique game code after {MAX_GENERATION_ATTEMPTS} attempts"
     logger.error(error_msg)
-    raise RuntimeError(error_msg)
+    raise CodeGenerationError(error_msg)
 
 
 def _generate_code(prefixes, suffix_length):
@@ -53,18 +80,16 @@ def _generate_code(prefixes, suffix_length):
     Internal function to generate a single game code without uniqueness check
     """
     # Choose random prefix
-    prefix = random.choice(prefixes)
+    prefix = _SYSTEM_RANDOM.choice(prefixes)
 
     # Determine suffix length
     if suffix_length is None:
-        length = random.randint(MIN_SUFFIX_LENGTH, MAX_SUFFIX_LENGTH)
+        length = _SYSTEM_RANDOM.randint(MIN_SUFFIX_LENGTH, MAX_SUFFIX_LENGTH)
     else:
         length = max(MIN_SUFFIX_LENGTH, min(suffix_length, MAX_SUFFIX_LENGTH))
 
-    # Generate random suffix
-    suffix = ''.join(random.choices(SUFFIX_CHARS, k=length))
-
-    return f"{prefix}{suffix}"
+    # Draw the whole suffix in one call and join it onto the prefix directly
+    return "".join([prefix, *_SYSTEM_RANDOM.choices(SUFFIX_CHARS, k=length)])
 
 
 def validate_game_code_format(code: str) -> bool:
@@ -73,33 +98,5 @@ def validate_game_code_format(code: str) -> bool:
     """
     if not code or not isinstance(code, str):
         return False
-    
-    # Check total length
-    if len(code) < 6 or len(code) > 10:
-        return False
-    
-    # Check if starts with valid prefix
-    code_upper = code.upper()
-    has_valid_prefix = any(code_upper.startswith(prefix) for prefix in PREFIXES)
-    
-    if not has_valid_prefix:
-        return False
-    
-    # Extract suffix and validate
-    for prefix in PREFIXES:
-        if code_upper.startswith(prefix):
-            suffix = code[len(prefix):]
-            
-            # Check suffix length
-            if len(suffix) < MIN_SUFFIX_LENGTH or len(suffix) > MAX_SUFFIX_LENGTH:
-                return False
-            
-            # Check suffix contains only allowed characters
-            if not all(c in SUFFIX_CHARS for c in suffix.upper()):
-                return False
-            
-            return True
-    
-    return False
 
-    
+    return _CODE_FORMAT_RE.match(code) is not None
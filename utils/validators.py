@@ -15,6 +15,8 @@ class ParticipantNameValidator:
     MIN_LENGTH = 2
     MAX_LENGTH = 50
 
+    _NAME_RE = re.compile(r"\A[\w\s\-.]+\Z")
+
     @staticmethod
     def validate_or_raise(name: str) -> None:
         """
@@ -26,23 +28,23 @@ class ParticipantNameValidator:
         Raises:
             ValidationError: If name is invalid
         """
-        if not name or not name.strip():
+        name = name.strip() if name else ""
+        if not name:
             raise ValidationError("Ім'я не може бути порожнім")
 
-        name = name.strip()
-
-        if len(name) < ParticipantNameValidator.MIN_LENGTH:
+        # Cheap length checks first, so oversized input never reaches the regex
+        if len(name) > ParticipantNameValidator.MAX_LENGTH:
             raise ValidationError(
-                f"Ім'я занадто коротке (мінімум {ParticipantNameValidator.MIN_LENGTH} символи)"
+                f"Ім'я занадто довге (максимум {ParticipantNameValidator.MAX_LENGTH} символів)"
             )
 
-        if len(name) > ParticipantNameValidator.MAX_LENGTH:
+        if len(name) < ParticipantNameValidator.MIN_LENGTH:
             raise ValidationError(
-                f"Ім'я занадто довге (максимум {ParticipantNameValidator.MAX_LENGTH} символів)"
+                f"Ім'я занадто коротке (мінімум {ParticipantNameValidator.MIN_LENGTH} символи)"
             )
 
         # Check for invalid characters - allow unicode letters, digits, spaces, hyphens, underscores, dots
-        if not re.match(r'^[\w\s\-\.]+$', name, re.UNICODE):
+        if not ParticipantNameValidator._NAME_RE.match(name):
             raise ValidationError(
                 "Ім'я може містити тільки літери, цифри, пробіли, дефіси та підкреслення"
             )